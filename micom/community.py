@@ -5,7 +5,11 @@ import pickle
 import cobra
 import cobra.util.solver
 import pandas as pd
+from functools import partial
+from itertools import count
 from optlang.symbolics import Zero
+from cobra.util.context import get_context
+from cobra.util.solver import interface_to_str
 from .constants import RANKS
 from .db import load_zip_model_db, load_manifest
 from .util import (
@@ -17,6 +21,8 @@ from .util import (
     compartment_id,
     COMPARTMENT_RE,
     ex_metabolite,
+    _objective_coefficients,
+    _objective_constraints,
 )
 from micom.optcom import optcom, solve
 from micom.problems import cooperative_tradeoff, knockout_taxa
@@ -24,11 +30,13 @@ from micom.qiime_formats import load_qiime_model_db
 from micom.taxonomy import unify_rank_prefixes
 import logging
 from rich.progress import track
+from os import path
 from tempfile import TemporaryDirectory
 
 cobra.io.sbml.LOGGER.setLevel("ERROR")
 cobra.util.solver.logger.setLevel("ERROR")
 logger = logging.getLogger(__name__)
+_versions = count(1)
 
 
 class Community(cobra.Model):
@@ -129,8 +137,8 @@ class Community(cobra.Model):
 
         Attributes
         ----------
-        taxa : list
-            A list of taxa IDs in the community.
+        taxa : tuple
+            The taxa IDs in the community.
 
         """
         super(Community, self).__init__(id, name)
@@ -154,6 +162,7 @@ class Community(cobra.Model):
         self.solver = solver
         self._rtol = rel_threshold
         self._modification = None
+        self._version = 0
         self.mass = mass
         self.__db_metrics = None
         adjust_solver_config(self.solver)
@@ -239,7 +248,6 @@ class Community(cobra.Model):
         self.__taxonomy = taxonomy
         self.__taxonomy.index = self.__taxonomy.id
 
-        obj = Zero
         self.taxa = []
         index = self.__taxonomy.index
         index = track(index, description="Building") if progress else index
@@ -276,14 +284,10 @@ class Community(cobra.Model):
                 m.community_id = idx
             logger.info("adding reactions for {} to community".format(idx))
             self.add_reactions(model.reactions)
-            o = self.solver.interface.Objective.clone(
-                model.objective, model=self.solver
-            )
-            obj += o.expression * row.abundance
+            obj = model.objective
+            obj_coefs = obj.get_linear_coefficients(obj.variables)
             self.taxa.append(idx)
-            taxa_obj = self.problem.Constraint(
-                o.expression, name="objective_" + idx, lb=0.0
-            )
+            taxa_obj = self.problem.Constraint(Zero, name="objective_" + idx, lb=0.0)
             self.add_cons_vars([taxa_obj])
             self.__add_exchanges(
                 model.reactions,
@@ -292,10 +296,16 @@ class Community(cobra.Model):
                 internal_exchange=max_exchange,
             )
             self.solver.update()  # to avoid dangling refs due to lazy add
+            taxa_obj.set_linear_coefficients(
+                {self.variables[v.name]: coef for v, coef in obj_coefs.items()}
+            )
 
         if compressed:
             tdir.cleanup()
-        com_obj = add_var_from_expression(self, "community_objective", obj, lb=0)
+        self.taxa = tuple(self.taxa)
+        com_obj = add_var_from_expression(self, "community_objective", Zero, lb=0)
+        self.solver.update()
+        self.__update_community_objective()
         self.objective = self.problem.Objective(com_obj, direction="max")
 
     def __add_exchanges(
@@ -385,37 +395,43 @@ class Community(cobra.Model):
             else:
                 r.upper_bound = internal_exchange
 
-    def __update_exchanges(self):
-        """Update exchanges."""
+    def __update_exchanges(self, taxa=None):
+        """Update exchanges.
+
+        Only updates the exchanges for the given taxa or all taxa if None.
+        """
         logger.info("updating exchange reactions for %s" % self.id)
+        if taxa is not None:
+            taxa = set(taxa)
+        abundance = self.__taxonomy.abundance.to_dict()
         for met in self.metabolites.query(lambda x: x.compartment == "m"):
             for r in met.reactions:
                 if r.boundary:
                     continue
-                coef = self.__taxonomy.loc[r.community_id, "abundance"]
+                if taxa is not None and r.community_id not in taxa:
+                    continue
+                coef = abundance[r.community_id]
                 if met in r.products:
                     r.add_metabolites({met: coef}, combine=False)
                 else:
                     r.add_metabolites({met: -coef}, combine=False)
 
-    def __update_community_objective(self):
-        """Update the community objective."""
+    def __update_community_objective(self, taxa=None):
+        """Update the community objective.
+
+        Only updates the coefficients for the given taxa or all taxa if None.
+        """
         logger.info("updating the community objective for %s" % self.id)
-        v = self.variables.community_objective
+        if taxa is None:
+            taxa = self.taxa
         const = self.constraints.community_objective_equality
-        self.remove_cons_vars([const])
-        com_obj = Zero
-        for sp in self.taxa:
-            ab = self.__taxonomy.loc[sp, "abundance"]
-            taxa_obj = self.constraints["objective_" + sp]
-            com_obj += ab * taxa_obj.expression
-        const = self.problem.Constraint(
-            (v - com_obj).expand(),
-            lb=0,
-            ub=0,
-            name="community_objective_equality",
-        )
-        self.add_cons_vars([const])
+        abundance = self.__taxonomy.abundance.to_dict()
+        coefs = {}
+        for sp in taxa:
+            ab = abundance[sp]
+            for var, coef in _objective_coefficients(self, sp).items():
+                coefs[var] = coefs.get(var, 0.0) - ab * coef
+        const.set_linear_coefficients(coefs)
 
     def optimize_single(self, id):
         """Optimize growth rate for one individual.
@@ -454,7 +470,7 @@ class Community(cobra.Model):
 
         logger.info("optimizing for {}".format(info.name))
 
-        obj = self.constraints["objective_" + info.name]
+        obj = _objective_constraints(self)[info.name]
         with self as m:
             m.objective = obj.expression
             m.solver.optimize()
@@ -480,14 +496,41 @@ class Community(cobra.Model):
         pandas.Series
             The maximal growth rate for each taxa.
 
+        Notes
+        -----
+        Results are reused if the community was not modified since the last
+        call.
+
         """
         logger.warning("`optimize_all` is deprecated and will be removed soon :(")
+        fingerprint = self.__fingerprint()
+        cached = getattr(self, "_max_growth_cache", None)
+        if cached is not None and cached[0] == fingerprint:
+            logger.info("community unchanged, reusing individual growth rates")
+            return cached[1].copy()
+
         index = self.__taxonomy.index
         if progress:
             index = track(self.__taxonomy.index, description="Optimizing")
 
-        individual = (self.optimize_single(id) for id in index)
-        return pd.Series(individual, self.__taxonomy.index)
+        # Only swap objective coefficients between taxa so the solver can
+        # start from the previous basis
+        individual = []
+        with self:
+            self.objective = self.problem.Objective(Zero, direction="max")
+            previous = {}
+            for id in index:
+                logger.info("optimizing for {}".format(id))
+                coefs = _objective_coefficients(self, id)
+                self.objective.set_linear_coefficients(
+                    {**{v: 0 for v in previous}, **coefs}
+                )
+                previous = coefs
+                self.solver.optimize()
+                individual.append(self.objective.value)
+        rates = pd.Series(individual, self.__taxonomy.index)
+        self._max_growth_cache = (fingerprint, rates.copy())
+        return rates
 
     def optimize(
         self, fluxes=False, pfba=False, raise_error=False, atol=None, rtol=None
@@ -567,7 +610,13 @@ class Community(cobra.Model):
             Whether to normalize the abundances to a total of 1.0. Many things
             in micom asssume that this is always the case. Only change this
             if you know what you are doing :O
+
+        Notes
+        -----
+        Changes will be reverted when used within a model context. Only the
+        exchanges of taxa whose abundance changed will be updated.
         """
+        old = self.__taxonomy.abundance.copy()
         try:
             self.__taxonomy.abundance = value
         except Exception:
@@ -585,8 +634,22 @@ class Community(cobra.Model):
                 % (str(self.__taxonomy.index[small]), self._rtol)
             )
             self.__taxonomy.loc[small, "abundance"] = self._rtol
-        self.__update_exchanges()
-        self.__update_community_objective()
+        context = get_context(self)
+        if context:
+            context(partial(self.__reset_abundance, old))
+        changed = self.__taxonomy.index[self.__taxonomy.abundance != old]
+        self.__update_exchanges(changed)
+        self.__update_community_objective(changed)
+
+    def __reset_abundance(self, abundance):
+        """Reset the abundances.
+
+        Exchanges are reset by the context so only the community objective
+        needs to be updated.
+        """
+        changed = self.__taxonomy.index[self.__taxonomy.abundance != abundance]
+        self.__taxonomy.abundance = abundance
+        self.__update_community_objective(changed)
 
     @property
     def taxonomy(self):
@@ -808,6 +871,7 @@ class Community(cobra.Model):
         method="change",
         progress=True,
         diag=True,
+        threads=1,
     ):
         """Sequentially knowckout a list of taxa in the model.
 
@@ -831,6 +895,10 @@ class Community(cobra.Model):
         diag : bool, optional
             Whether the diagonal should contain values as well. If False will
             be filled with NaNs.
+        threads : int, optional
+            How many knockouts to run in parallel. Defaults to 1. Each
+            process loads its own copy of the community, so this only pays
+            off for communities that take a while to solve.
 
         Returns
         -------
@@ -845,7 +913,8 @@ class Community(cobra.Model):
             taxa = self.taxa
         if isinstance(taxa, str):
             taxa = [taxa]
-        if any(sp not in self.taxa for sp in taxa):
+        known = set(self.taxa)
+        if any(sp not in known for sp in taxa):
             raise ValueError(
                 "At least one of the arguments is not a taxon " "in the community."
             )
@@ -853,7 +922,7 @@ class Community(cobra.Model):
             raise ValueError(
                 "`method` must be one of 'raw', 'change', " "or 'relative change'."
             )
-        return knockout_taxa(self, taxa, fraction, method, progress, diag)
+        return knockout_taxa(self, taxa, fraction, method, progress, diag, threads)
 
     @property
     def scale(self):
@@ -874,9 +943,106 @@ class Community(cobra.Model):
         -------
         Nothing
 
+        Notes
+        -----
+        Will skip writing the file if the community was already saved to the
+        same file and was not modified since.
+
         """
+        fingerprint = self.__fingerprint()
+        cached = getattr(self, "_pickle_cache", None)
+        if (
+            cached is not None
+            and path.exists(filename)
+            and cached == (filename, path.getmtime(filename), fingerprint)
+        ):
+            logger.info("community unchanged, skipping write to %s" % filename)
+            return
         with open(filename, mode="wb") as out:
             pickle.dump(self, out, protocol=pickle.HIGHEST_PROTOCOL)
+        self._pickle_cache = (filename, path.getmtime(filename), fingerprint)
+
+    def __fingerprint(self):
+        """Get a cheap hash of the mutable state of the community.
+
+        Covers the solver and its main settings, the bounds of all variables
+        and constraints, the abundances, the objective direction, the
+        modification and the version of the problem. Coefficients are not
+        hashed. Instead, adding or removing variables, constraints or
+        metabolites, changing a stoichiometry or setting a new objective gives
+        the community a new version.
+        """
+        config = self.solver.configuration
+        settings = []
+        for obj, attrs in [
+            (config, ["lp_method", "qp_method", "presolve", "timeout"]),
+            (config.tolerances, ["feasibility", "optimality", "integrality"]),
+        ]:
+            for attr in attrs:
+                try:
+                    settings.append(getattr(obj, attr))
+                except Exception:
+                    settings.append(None)
+        return hash(
+            (
+                interface_to_str(self.problem),
+                tuple(settings),
+                tuple((v.name, v.lb, v.ub, v.type) for v in self.variables),
+                tuple((c.name, c.lb, c.ub) for c in self.constraints),
+                tuple(self.__taxonomy.abundance),
+                self.objective.direction,
+                self._modification,
+                getattr(self, "_version", 0),
+            )
+        )
+
+    def __new_version(self):
+        """Mark the problem of the community as changed.
+
+        Every change gets a new version. The previous one is restored when
+        leaving the context the change was made in.
+        """
+        context = get_context(self)
+        if context:
+            context(partial(setattr, self, "_version", getattr(self, "_version", 0)))
+        self._version = next(_versions)
+
+    def add_cons_vars(self, what, **kwargs):
+        """Add constraints and variables to the problem of the community."""
+        super().add_cons_vars(what, **kwargs)
+        self.__new_version()
+
+    def remove_cons_vars(self, what):
+        """Remove constraints and variables from the problem of the community."""
+        super().remove_cons_vars(what)
+        self.__new_version()
+
+    def add_metabolites(self, metabolite_list):
+        """Add metabolites to the community.
+
+        Also called by reactions of the community whenever their stoichiometry
+        changes.
+        """
+        super().add_metabolites(metabolite_list)
+        self.__new_version()
+
+    @cobra.Model.objective.setter
+    def objective(self, value):
+        """Set the objective."""
+        cobra.Model.objective.fset(self, value)
+        self.__new_version()
+
+    def __getstate__(self):
+        """Get the state for serialization without the caches."""
+        state = super().__getstate__()
+        state.pop("_pickle_cache", None)
+        state.pop("_max_growth_cache", None)
+        state.pop("_fast_dual_cache", None)
+        state.pop("_objective_coef_cache", None)
+        state.pop("_l2_cache", None)
+        state.pop("_objective_const_cache", None)
+        state.pop("_layout_cache", None)
+        return state
 
     @cobra.Model.solver.setter
     def solver(self, s):
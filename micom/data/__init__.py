@@ -9,7 +9,16 @@ import pickle
 __all__ = ("agora", "test_taxonomy")
 this_dir, _ = split(__file__)
 
-agora = pd.read_csv(join(this_dir, "agora.csv"))
+
+def _read_csv(filepath):
+    """Read a CSV file with the multithreaded pyarrow parser if available."""
+    try:
+        return pd.read_csv(filepath, engine="pyarrow")
+    except ImportError:
+        return pd.read_csv(filepath)
+
+
+agora = _read_csv(join(this_dir, "agora.csv"))
 agora["file"] = agora["id"] + ".xml"
 
 test_db = join(this_dir, "artifacts", "species_models.qza")
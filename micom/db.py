@@ -2,6 +2,7 @@
 
 import pandas as pd
 import os
+from concurrent.futures import ThreadPoolExecutor
 from os import path
 from zipfile import ZipFile
 
@@ -21,12 +22,39 @@ def load_manifest(folder):
     return manifest
 
 
-def load_zip_model_db(artifact, extract_path):
-    """Prepare a model database for use."""
+def _extract_members(artifact, members, extract_path):
+    """Extract some members from a zip file."""
+    with ZipFile(artifact) as zf:
+        for m in members:
+            zf.extract(m, extract_path)
+
+
+def load_zip_model_db(artifact, extract_path, threads=None):
+    """Prepare a model database for use.
+
+    Members are extracted in parallel, using one `ZipFile` handle per thread
+    since those are not safe to share.
+    """
     if not path.exists(extract_path):
         os.mkdir(extract_path)
+    if threads is None:
+        threads = min(32, 4 * (os.cpu_count() or 1))
     with ZipFile(artifact) as zf:
-        zf.extractall(extract_path)
+        members = zf.namelist()
+    # create all folders first to avoid races between the threads
+    root = path.abspath(extract_path)
+    for folder in set(path.dirname(m) for m in members):
+        folder = path.abspath(path.join(root, folder))
+        if folder.startswith(root):
+            os.makedirs(folder, exist_ok=True)
+    threads = max(1, min(threads, len(members)))
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = [
+            pool.submit(_extract_members, artifact, members[i::threads], extract_path)
+            for i in range(threads)
+        ]
+        for f in futures:
+            f.result()
     manifest = load_manifest(extract_path)
     manifest["file"] = [path.join(extract_path, f) for f in manifest.file]
     return manifest
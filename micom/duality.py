@@ -1,47 +1,106 @@
 """Implements a fast dual formulation."""
 
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
 from sympy.core.singleton import S
 from micom.logger import logger
 
 
-def fast_dual(model, prefix="dual_"):
-    """Add dual formulation to the problem.
+def _objective_component(model, objective=None):
+    """Find the variables and constraints connected to the objective.
 
-    A mathematical optimization problem can be viewed as a primal and a dual
-    problem. If the primal problem is a minimization problem the dual is a
-    maximization problem, and the optimal value of the dual is a lower bound of
-    the optimal value of the primal. For linear problems, strong duality holds,
-    which means that the optimal values of the primal and dual are equal
-    (duality gap = 0). This functions takes an optlang Model representing a
-    primal linear problem
-    and returns a new Model representing the dual optimization problem. The
-    provided model must have a linear objective, linear constraints and only
-    continuous variables. Furthermore, the problem must be in standard form,
-    i.e. all variables should be non-negative. Both minimization and
-    maximization problems are allowed.
+    Builds the bipartite graph of variables and constraints and returns the
+    connected components containing the objective variables. Anything outside
+    of it can not affect the optimal objective value.
 
     Attributes
     ----------
     model : cobra.Model
-        The model to be dualized.
-    prefix : str
-        The string that will be prepended to all variable and constraint names
-        in the returned dual problem.
+        The model to analyze.
+    objective : dict, optional
+        The linear coefficients of the objective. Defaults to the model
+        objective.
 
     Returns
     -------
-    dict
-        The coefficients for the new dual objective.
+    tuple of (set, set)
+        The names of the connected variables and constraints.
 
     """
-    logger.info("adding dual variables")
-    if len(model.variables) > 1e5:
-        logger.warning(
-            "the model has a lot of variables,"
-            "dual optimization will be extremely slow :O"
+    if objective is None:
+        objective = model.objective.get_linear_coefficients(
+            model.objective.variables
         )
-    prob = model.problem
+    variables = model.variables
+    constraints = model.constraints
+    index = {v.name: i for i, v in enumerate(variables)}
+    n = len(variables)
+    rows = []
+    cols = []
+    for j, constraint in enumerate(constraints):
+        for v in constraint.variables:
+            rows.append(index[v.name])
+            cols.append(n + j)
+    size = n + len(constraints)
+    graph = coo_matrix((np.ones(len(rows)), (rows, cols)), shape=(size, size))
+    _, labels = connected_components(graph, directed=False)
+    components = {labels[index[v.name]] for v in objective}
+    connected = np.isin(labels, list(components))
+    connected_vars = {v.name for i, v in enumerate(variables) if connected[i]}
+    connected_consts = {c.name for j, c in enumerate(constraints) if connected[n + j]}
+    return connected_vars, connected_consts
+
+
+def _dual_key(model, objective, prefix):
+    """Get a hash of everything the dual formulation depends on.
+
+    Coefficients are covered by the version of the community which changes
+    with every structural modification. Returns None for models without a
+    version which are never cached.
+    """
+    version = getattr(model, "_version", None)
+    if version is None:
+        return None
+    return hash(
+        (
+            prefix,
+            version,
+            model.objective.direction,
+            len(model.variables),
+            len(model.constraints),
+            tuple((v.lb, v.ub, v.type) for v in model.variables),
+            tuple((c.lb, c.ub) for c in model.constraints),
+            tuple((v.name, coef) for v, coef in objective.items()),
+            tuple(getattr(model, "abundances", ())),
+        )
+    )
+
+
+def _dual_plan(model, objective, prefix):
+    """Analyze the primal problem and describe its dual.
+
+    Only uses names and numbers so the result can be reused to rebuild the
+    dual of an unchanged model.
+
+    Attributes
+    ----------
+    model : cobra.Model
+        The model to be dualized.
+    objective : dict
+        The linear coefficients of the primal objective.
+    prefix : str
+        The string that will be prepended to all dual names.
 
+    Returns
+    -------
+    tuple of (list, dict, dict, list)
+        The dual variables as (name, lower bound) tuples, the dual objective
+        coefficients, the dual coefficients for each primal variable, and the
+        dual constraints as (primal variable name, objective coefficient)
+        tuples.
+
+    """
     maximization = model.objective.direction == "max"
 
     if maximization:
@@ -52,11 +111,18 @@ def fast_dual(model, prefix="dual_"):
     coefficients = {}
     dual_objective = {}
     to_add = []
+    connected_vars, connected_consts = _objective_component(model, objective)
+    logger.info(
+        "%d of %d constraints are connected to the objective"
+        % (len(connected_consts), len(model.constraints))
+    )
 
     # Add dual variables from primal constraints:
     for constraint in model.constraints:
         if constraint.expression == 0:
             continue  # Skip empty constraint
+        if constraint.name not in connected_consts:
+            continue  # Skip constraint not affecting the objective
         if not constraint.is_Linear:
             raise ValueError(
                 "Non-linear problems are not supported: " + str(constraint)
@@ -65,30 +131,24 @@ def fast_dual(model, prefix="dual_"):
             logger.debug("skipped free constraint %s" % constraint.name)
             continue  # Skip free constraint
         if constraint.lb == constraint.ub:
-            const_var = prob.Variable(
-                prefix + constraint.name + "_constraint", lb=None, ub=None
-            )
-            to_add.append(const_var)
+            const_var = prefix + constraint.name + "_constraint"
+            to_add.append((const_var, None))
             if constraint.lb != 0:
-                dual_objective[const_var.name] = sign * constraint.lb
+                dual_objective[const_var] = sign * constraint.lb
             coefs = constraint.get_linear_coefficients(constraint.variables)
             for variable, coef in coefs.items():
-                coefficients.setdefault(variable.name, {})[const_var.name] = sign * coef
+                coefficients.setdefault(variable.name, {})[const_var] = sign * coef
         else:
             if constraint.lb is not None:
-                lb_var = prob.Variable(
-                    prefix + constraint.name + "_constraint_lb", lb=0, ub=None
-                )
-                to_add.append(lb_var)
+                lb_var = prefix + constraint.name + "_constraint_lb"
+                to_add.append((lb_var, 0))
                 if constraint.lb != 0:
-                    dual_objective[lb_var.name] = -sign * constraint.lb
+                    dual_objective[lb_var] = -sign * constraint.lb
             if constraint.ub is not None:
-                ub_var = prob.Variable(
-                    prefix + constraint.name + "_constraint_ub", lb=0, ub=None
-                )
-                to_add.append(ub_var)
+                ub_var = prefix + constraint.name + "_constraint_ub"
+                to_add.append((ub_var, 0))
                 if constraint.ub != 0:
-                    dual_objective[ub_var.name] = sign * constraint.ub
+                    dual_objective[ub_var] = sign * constraint.ub
 
             if not (constraint.expression.is_Add or constraint.expression.is_Mul):
                 raise ValueError(
@@ -104,11 +164,11 @@ def fast_dual(model, prefix="dual_"):
 
             for variable, coef in coefficients_dict.items():
                 if constraint.lb is not None:
-                    coefficients.setdefault(variable.name, {})[lb_var.name] = (
+                    coefficients.setdefault(variable.name, {})[lb_var] = (
                         -sign * coef
                     )
                 if constraint.ub is not None:
-                    coefficients.setdefault(variable.name, {})[ub_var.name] = (
+                    coefficients.setdefault(variable.name, {})[ub_var] = (
                         sign * coef
                     )
 
@@ -122,35 +182,101 @@ def fast_dual(model, prefix="dual_"):
                 + variable.name
                 + " can be negative)"
             )
+        if variable.name not in connected_vars:
+            continue  # Skip variable not affecting the objective
         if variable.lb > 0:
-            bound_var = prob.Variable(prefix + variable.name + "_lb", lb=0, ub=None)
-            to_add.append(bound_var)
-            coefficients.setdefault(variable.name, {})[bound_var.name] = -sign
-            dual_objective[bound_var.name] = -sign * variable.lb
+            bound_var = prefix + variable.name + "_lb"
+            to_add.append((bound_var, 0))
+            coefficients.setdefault(variable.name, {})[bound_var] = -sign
+            dual_objective[bound_var] = -sign * variable.lb
         if variable.ub is not None:
-            bound_var = prob.Variable(prefix + variable.name + "_ub", lb=0, ub=None)
-            to_add.append(bound_var)
-            coefficients.setdefault(variable.name, {})[bound_var.name] = sign
+            bound_var = prefix + variable.name + "_ub"
+            to_add.append((bound_var, 0))
+            coefficients.setdefault(variable.name, {})[bound_var] = sign
             if variable.ub != 0:
-                dual_objective[bound_var.name] = sign * variable.ub
+                dual_objective[bound_var] = sign * variable.ub
+
+    # Dual constraints from the primal objective
+    objective_vars = [(variable.name, coef) for variable, coef in objective.items()]
+    return to_add, dual_objective, coefficients, objective_vars
 
-    model.add_cons_vars(to_add)
+
+def fast_dual(model, prefix="dual_", objective=None):
+    """Add dual formulation to the problem.
+
+    A mathematical optimization problem can be viewed as a primal and a dual
+    problem. If the primal problem is a minimization problem the dual is a
+    maximization problem, and the optimal value of the dual is a lower bound of
+    the optimal value of the primal. For linear problems, strong duality holds,
+    which means that the optimal values of the primal and dual are equal
+    (duality gap = 0). This functions takes an optlang Model representing a
+    primal linear problem
+    and returns a new Model representing the dual optimization problem. The
+    provided model must have a linear objective, linear constraints and only
+    continuous variables. Furthermore, the problem must be in standard form,
+    i.e. all variables should be non-negative. Both minimization and
+    maximization problems are allowed. Constraints and variables that are
+    not connected to the objective are skipped since they can not affect the
+    optimal objective value.
+
+    Attributes
+    ----------
+    model : cobra.Model
+        The model to be dualized.
+    prefix : str
+        The string that will be prepended to all variable and constraint names
+        in the returned dual problem.
+    objective : dict, optional
+        The linear coefficients of the primal objective to dualize, using the
+        direction of the model objective. Defaults to the model objective,
+        which allows dualizing another objective without setting it first.
+
+    Returns
+    -------
+    dict
+        The coefficients for the new dual objective.
+
+    """
+    logger.info("adding dual variables")
+    if len(model.variables) > 1e5:
+        logger.warning(
+            "the model has a lot of variables,"
+            "dual optimization will be extremely slow :O"
+        )
+    prob = model.problem
+    maximization = model.objective.direction == "max"
+    if objective is None:
+        objective = model.objective.get_linear_coefficients(
+            model.objective.variables
+        )
+
+    key = _dual_key(model, objective, prefix)
+    cached = getattr(model, "_fast_dual_cache", None)
+    if key is not None and cached is not None and cached[0] == key:
+        logger.info("model unchanged, reusing the dual formulation")
+        plan = cached[1]
+    else:
+        plan = _dual_plan(model, objective, prefix)
+        if key is not None:
+            model._fast_dual_cache = (key, plan)
+    to_add, dual_objective, coefficients, objective_vars = plan
+
+    model.add_cons_vars([prob.Variable(name, lb=lb, ub=None) for name, lb in to_add])
 
     # Add dual constraints from primal objective
-    primal_objective_dict = model.objective.get_linear_coefficients(
-        model.objective.variables
-    )
-    for variable in model.objective.variables:
-        obj_coef = primal_objective_dict[variable]
+    dual_consts = []
+    for vid, obj_coef in objective_vars:
         if maximization:
-            const = prob.Constraint(S.Zero, lb=obj_coef, name=prefix + variable.name)
+            const = prob.Constraint(S.Zero, lb=obj_coef, name=prefix + vid)
         else:
-            const = prob.Constraint(S.Zero, ub=obj_coef, name=prefix + variable.name)
-        model.add_cons_vars([const])
-        model.solver.update()
+            const = prob.Constraint(S.Zero, ub=obj_coef, name=prefix + vid)
+        dual_consts.append((const, vid))
+    model.add_cons_vars([const for const, _ in dual_consts])
+    model.solver.update()
+    for const, vid in dual_consts:
         coefs = {
-            model.variables[vid]: coef
-            for vid, coef in coefficients[variable.name].items()
+            model.variables[dual_vid]: coef
+            for dual_vid, coef in coefficients[vid].items()
         }
         const.set_linear_coefficients(coefs)
 
@@ -5,38 +5,268 @@ quantities.
 """
 
 from functools import partial
+from os import path
+from tempfile import TemporaryDirectory
 import pandas as pd
 import numpy as np
 from cobra.util import get_context
-from micom.util import reset_min_community_growth
+from micom.util import reset_min_community_growth, load_pickle
 from micom.problems import regularize_l2_norm
-from micom.solution import optimize_with_fraction
+from micom.solution import optimize_with_fraction, optimize_with_retry
+from micom.workflows.core import workflow
 from rich.progress import track
 
+try:
+    from numba import njit
+except ImportError:
+    njit = None
 
 STEP = 0.1
+DIRECTIONS = np.array(["zero", "forward", "reverse"])
 
 
-def _get_fluxes(sol, reactions):
-    """Get the primal values for a set of variables."""
-    fluxes = {r.id: sol.fluxes.loc[r.community_id, r.global_id] for r in reactions}
-    return pd.Series(fluxes)
+def _flux_index(reactions):
+    """Get the taxa and reaction IDs to look up fluxes for a set of reactions."""
+    return [r.community_id for r in reactions], [r.global_id for r in reactions]
+
+
+def _get_fluxes(sol, index):
+    """Get the fluxes for a set of reactions as an array.
+
+    Uses a single positional lookup for all reactions given the
+    index obtained from `_flux_index`.
+    """
+    taxa, rids = index
+    rows = sol.fluxes.index.get_indexer(taxa)
+    cols = sol.fluxes.columns.get_indexer(rids)
+    if (rows < 0).any() or (cols < 0).any():
+        missing = [
+            (sp, rid) for sp, rid, i, j in zip(taxa, rids, rows, cols) if i < 0 or j < 0
+        ]
+        raise KeyError("no fluxes for the reactions %s." % missing)
+    return sol.fluxes.to_numpy()[rows, cols]
+
+
+def _reaction_info(reactions):
+    """Get the IDs and taxa for a set of reactions."""
+    reaction_ids = np.array([r.global_id for r in reactions])
+    taxon_ids = np.array([next(iter(r.compartments)) for r in reactions])
+    return reaction_ids, taxon_ids
+
+
+def _derivative_kernel(before, after, derivs, code):
+    """Calculate elasticities and direction codes in a single pass."""
+    for i in range(before.shape[0]):
+        b, a = before[i], after[i]
+        derivs[i] = (np.log(abs(a) + 1e-6) - np.log(abs(b) + 1e-6)) * (1.0 / STEP)
+        if b < -1e-6 or a < -1e-6:
+            code[i] = 2
+        elif b > 1e-6 or a > 1e-6:
+            code[i] = 1
+        else:
+            code[i] = 0
+
+
+if njit is not None:
+    _derivative_kernel = njit(cache=True)(_derivative_kernel)
 
 
 def _derivatives(before, after):
-    """Get the elasticities for fluxes."""
-    before_signs = np.sign(before)
-    after_signs = np.sign(after)
-    if any(np.abs(before_signs - after_signs) > 2):
-        ValueError("Some of the fluxes changed sign. " "Can't compute elasticities :(")
-    direction = np.repeat("zero", len(before)).astype("<U8")
-    direction[(before > 1e-6) | (after > 1e-6)] = "forward"
-    direction[(before < -1e-6) | (after < -1e-6)] = "reverse"
-    derivs = (np.log(after.abs() + 1e-6) - np.log(before.abs() + 1e-6)) / STEP
-    return derivs, direction
-
-
-def elasticities_by_medium(com, reactions, fraction, growth_rate, progress):
+    """Get the elasticities for fluxes.
+
+    Expects the fluxes as numpy arrays. Will use a compiled kernel if numba
+    is installed.
+    """
+    if njit is not None:
+        before = np.ascontiguousarray(before, dtype=np.float64)
+        after = np.ascontiguousarray(after, dtype=np.float64)
+        derivs = np.empty(before.shape[0])
+        code = np.empty(before.shape[0], dtype=np.int64)
+        _derivative_kernel(before, after, derivs, code)
+        return derivs, DIRECTIONS[code]
+
+    log_change = np.log(np.abs(after) + 1e-6) - np.log(np.abs(before) + 1e-6)
+    derivs = log_change * (1.0 / STEP)
+    code = np.where(
+        (before < -1e-6) | (after < -1e-6),
+        2,
+        np.where((before > 1e-6) | (after > 1e-6), 1, 0),
+    )
+    return derivs, DIRECTIONS[code]
+
+
+def _elasticity_frame(responses, reactions, before):
+    """Assemble the elasticities for all effectors into a single DataFrame."""
+    reaction_ids, taxon_ids = _reaction_info(reactions)
+    effectors, directions, derivs = [], [], []
+    for effector, after in responses:
+        deriv, dirs = _derivatives(before, after)
+        effectors.append(effector)
+        directions.append(dirs)
+        derivs.append(deriv)
+    n = len(effectors)
+    return pd.DataFrame(
+        {
+            "reaction": np.tile(reaction_ids, n),
+            "taxon": np.tile(taxon_ids, n),
+            "effector": np.repeat(np.array(effectors, dtype=object), len(before)),
+            "direction": np.concatenate(directions) if n else [],
+            "elasticity": np.concatenate(derivs) if n else [],
+        }
+    )
+
+
+def _max_growth(com):
+    """Get the maximal community growth rate and the primal values at it.
+
+    Will integrate with the context.
+    """
+    context = get_context(com)
+    if context:
+        context(partial(reset_min_community_growth, com))
+    reset_min_community_growth(com)
+    with com:
+        com.objective = com.scale * com.variables.community_objective
+        growth_rate = optimize_with_retry(
+            com, message="could not get community growth rate."
+        )
+        primals = com.solver.primal_values
+    return growth_rate / com.scale, primals
+
+
+def _base_solution(com, fraction, growth_rate):
+    """Get the unperturbed solution all responses are compared to.
+
+    Also keeps the primal values of the maximal growth solution that is
+    solved on the way.
+    """
+    regularize_l2_norm(com, 0.0)
+    max_growth, primals = _max_growth(com)
+    if growth_rate is None:
+        growth_rate = max_growth
+    return optimize_with_fraction(com, fraction, growth_rate, True), primals
+
+
+def _use_warm_start(com):
+    """Switch to a simplex method that can reuse the previous basis.
+
+    Uses the dual simplex if the solver supports it and the primal simplex
+    otherwise. Will integrate with the context.
+    """
+    config = com.solver.configuration
+    try:
+        old = config.lp_method
+    except AttributeError:
+        return
+    for method in ["dual", "simplex"]:
+        try:
+            config.lp_method = method
+        except ValueError:
+            continue
+        context = get_context(com)
+        if context:
+            context(partial(setattr, config, "lp_method", old))
+        return
+
+
+def _reoptimize_with_bound_change(
+    com, reaction, new_bound, side, fraction, growth_rate
+):
+    """Optimize with a changed bound and reset the bound afterwards.
+
+    This avoids the overhead of the model context and keeps the solver state
+    so the optimization can start from the previous solution.
+    """
+    attr = side + "_bound"
+    old = getattr(reaction, attr)
+    setattr(reaction, attr, new_bound)
+    try:
+        sol = optimize_with_fraction(com, fraction, growth_rate, True)
+    finally:
+        setattr(reaction, attr, old)
+    return sol
+
+
+def _perturbed_side(flux):
+    """Get the side of the bound that is perturbed for an import flux."""
+    return "lower" if flux < -1e-6 else "upper"
+
+
+def _slack_effectors(import_fluxes, fluxes, primals):
+    """Find the imports whose perturbed bound is not active.
+
+    Relaxing a bound that is not active in the maximal growth solution and the
+    base solution leaves both optima intact. Thus, those perturbations will not
+    change any flux and do not need to be optimized. `primals` are the primal
+    values of the maximal growth solution.
+    """
+    slack = set()
+    for r, flux in zip(import_fluxes.index, fluxes):
+        growth_flux = (
+            primals[r.forward_variable.name] - primals[r.reverse_variable.name]
+        )
+        if _perturbed_side(import_fluxes[r]) == "lower":
+            gap = min(growth_flux, flux) - r.lower_bound
+        else:
+            gap = r.upper_bound - max(growth_flux, flux)
+        if gap > 1e-6:
+            slack.add(r.id)
+    return slack
+
+
+def _medium_response(com, effector, index, fraction, growth_rate):
+    """Get the fluxes after increasing the import of a single metabolite."""
+    rid, flux = effector
+    r = com.reactions.get_by_id(rid)
+    side = _perturbed_side(flux)
+    new_bound = getattr(r, side + "_bound") * np.exp(STEP)
+    sol = _reoptimize_with_bound_change(com, r, new_bound, side, fraction, growth_rate)
+    return rid, _get_fluxes(sol, index)
+
+
+def _abundance_response(com, sp, index, fraction, growth_rate):
+    """Get the fluxes after increasing the abundance of a single taxon."""
+    abundance = com.abundances.copy()
+    abundance.loc[sp] *= np.exp(STEP)
+    with com:
+        com.set_abundance(abundance, normalize=False)
+        sol = optimize_with_fraction(com, fraction, growth_rate, True)
+        after = _get_fluxes(sol, index)
+    return sp, after
+
+
+def _response_worker(args):
+    """Get the responses to a batch of effectors in a separate process."""
+    filename, response, effectors, index, fraction, growth_rate = args
+    com = load_pickle(filename)
+    return [response(com, e, index, fraction, growth_rate) for e in effectors]
+
+
+def _parallel_responses(
+    com, response, effectors, index, fraction, growth_rate, threads
+):
+    """Get the responses for several effectors in parallel.
+
+    The effectors are split into one batch per process so that every process
+    only has to load the community once.
+    """
+    effectors = list(effectors)
+    batches = [effectors[i::threads] for i in range(threads)]
+    with TemporaryDirectory(prefix="micom_") as tdir:
+        filename = path.join(tdir, "community.pickle")
+        com.to_pickle(filename)
+        args = [
+            (filename, response, b, index, fraction, growth_rate)
+            for b in batches
+            if len(b) > 0
+        ]
+        results = workflow(_response_worker, args, threads, progress=False)
+    return [r for batch in results for r in batch]
+
+
+def elasticities_by_medium(
+    com, reactions, fraction, growth_rate, progress, threads=1, base=None
+):
     """Get the elasticity coefficients for a set of variables.
 
     Arguments
@@ -46,6 +276,9 @@ def elasticities_by_medium(com, reactions, fraction, growth_rate, progress):
     variables : list of optlang.Variable
         The variables for which to calculate the elasticities. All of these
         must have non-zero primal vaues in the previous solution.
+    base : tuple of (micom.CommunitySolution, dict)
+        The unperturbed solution and the primal values at maximal growth as
+        returned by `_base_solution`. Will be calculated if not provided.
 
     Returns
     -------
@@ -53,50 +286,54 @@ def elasticities_by_medium(com, reactions, fraction, growth_rate, progress):
         The long/tidy version of the elasticities. Contains columns variable,
         effector, and elasticity.
     """
-    regularize_l2_norm(com, 0.0)
-    sol = optimize_with_fraction(com, fraction, growth_rate, True)
-    before = _get_fluxes(sol, reactions)
-    import_fluxes = pd.Series(dtype="float64")
-    dfs = []
-
-    for ex in com.exchanges:
-        export = len(ex.reactants) == 1
-        flux = sol.fluxes.loc[ex.community_id, ex.global_id]
-        if export and (flux < -1e-6):
-            import_fluxes[ex] = flux
-        elif not export and (flux > 1e-6):
-            import_fluxes[ex] = -flux
-        else:
-            continue
+    with com:
+        context = get_context(com)
+        context(partial(reset_min_community_growth, com))
+        if base is None:
+            base = _base_solution(com, fraction, growth_rate)
+        sol, primals = base
+        index = _flux_index(reactions)
+        before = _get_fluxes(sol, index)
+        import_fluxes = pd.Series(dtype="float64")
+        reaction_fluxes = []
 
-    fluxes = import_fluxes.index
-    if progress:
-        fluxes = track(fluxes, description="Metabolites")
-    for r in fluxes:
-        flux = import_fluxes[r]
-        with com:
-            if flux < -1e-6:
-                r.lower_bound *= np.exp(STEP)
+        exchanges = com.exchanges
+        exchange_fluxes = _get_fluxes(sol, _flux_index(exchanges))
+        for ex, flux in zip(exchanges, exchange_fluxes):
+            export = len(ex.reactants) == 1
+            if export and (flux < -1e-6):
+                import_fluxes[ex] = flux
+            elif not export and (flux > 1e-6):
+                import_fluxes[ex] = -flux
             else:
-                r.upper_bound *= np.exp(STEP)
-            sol = optimize_with_fraction(com, fraction, growth_rate, True)
-            after = _get_fluxes(sol, reactions)
-        deriv, dirs = _derivatives(before, after)
-        res = pd.DataFrame(
-            {
-                "reaction": [rx.global_id for rx in reactions],
-                "taxon": [list(r.compartments)[0] for r in reactions],
-                "effector": r.id,
-                "direction": dirs,
-                "elasticity": deriv,
-            }
-        )
-        dfs.append(res)
+                continue
+            reaction_fluxes.append(flux)
 
-    return pd.concat(dfs)
+        slack = _slack_effectors(import_fluxes, reaction_fluxes, primals)
+        effectors = [(r.id, import_fluxes[r]) for r in import_fluxes.index]
+        if threads > 1:
+            args = [e for e in effectors if e[0] not in slack]
+            changed = dict(
+                _parallel_responses(
+                    com, _medium_response, args, index, fraction, growth_rate, threads
+                )
+            )
+            responses = ((rid, changed.get(rid, before)) for rid, _ in effectors)
+        else:
+            if progress:
+                effectors = track(effectors, description="Metabolites")
+            responses = (
+                (e[0], before)
+                if e[0] in slack
+                else _medium_response(com, e, index, fraction, growth_rate)
+                for e in effectors
+            )
+        return _elasticity_frame(responses, reactions, before)
 
 
-def elasticities_by_abundance(com, reactions, fraction, growth_rate, progress):
+def elasticities_by_abundance(
+    com, reactions, fraction, growth_rate, progress, threads=1, base=None
+):
     """Get the elasticity coefficients for a set of variables.
 
     Arguments
@@ -106,6 +343,9 @@ def elasticities_by_abundance(com, reactions, fraction, growth_rate, progress):
     variables : list of optlang.Variable
         The variables for which to calculate the elasticities. All of these
         must have non-zero primal vaues in the previous solution.
+    base : tuple of (micom.CommunitySolution, dict)
+        The unperturbed solution and the primal values at maximal growth as
+        returned by `_base_solution`. Will be calculated if not provided.
 
     Returns
     -------
@@ -113,40 +353,37 @@ def elasticities_by_abundance(com, reactions, fraction, growth_rate, progress):
         The long/tidy version of the elasticities. Contains columns variable,
         effector, and elasticity.
     """
-    regularize_l2_norm(com, 0.0)
-    sol = optimize_with_fraction(com, fraction, growth_rate, True)
-    before = _get_fluxes(sol, reactions)
-    dfs = []
-
-    abundance = com.abundances.copy()
-    taxa = abundance.index
-
-    if progress:
-        taxa = track(taxa, description="Taxa")
-    for sp in taxa:
-        old = abundance[sp]
-        abundance.loc[sp] *= np.exp(STEP)
-        com.set_abundance(abundance, normalize=False)
-        sol = optimize_with_fraction(com, fraction, growth_rate, True)
-        after = _get_fluxes(sol, reactions)
-        abundance.loc[sp] = old
-        com.set_abundance(abundance, normalize=False)
-        deriv, dirs = _derivatives(before, after)
-        res = pd.DataFrame(
-            {
-                "reaction": [r.global_id for r in reactions],
-                "taxon": [list(r.compartments)[0] for r in reactions],
-                "effector": sp,
-                "direction": dirs,
-                "elasticity": deriv,
-            }
-        )
-        dfs.append(res)
+    with com:
+        context = get_context(com)
+        context(partial(reset_min_community_growth, com))
+        if base is None:
+            base = _base_solution(com, fraction, growth_rate)
+        sol, _ = base
+        index = _flux_index(reactions)
+        before = _get_fluxes(sol, index)
 
-    return pd.concat(dfs)
+        if threads > 1:
+            responses = _parallel_responses(
+                com,
+                _abundance_response,
+                com.abundances.index,
+                index,
+                fraction,
+                growth_rate,
+                threads,
+            )
+        else:
+            taxa = com.abundances.index
+            if progress:
+                taxa = track(taxa, description="Taxa")
+            responses = (
+                _abundance_response(com, sp, index, fraction, growth_rate)
+                for sp in taxa
+            )
+        return _elasticity_frame(responses, reactions, before)
 
 
-def elasticities(com, fraction=0.5, reactions=None, progress=True):
+def elasticities(com, fraction=0.5, reactions=None, progress=True, threads=1):
     """Calculate elasticities for reactions.
 
     Calculates elasticity coefficients using the specified reactions as
@@ -168,6 +405,9 @@ def elasticities(com, fraction=0.5, reactions=None, progress=True):
     progress : boolean
         Whether to shwo progress bars. Will show two, one for the diet
         optimizations and another one for the taxa abundances.
+    threads : int >=1
+        The number of processes to use. Perturbations for individual effectors
+        will be optimized in parallel if larger than 1.
 
     Returns
     -------
@@ -189,13 +429,15 @@ def elasticities(com, fraction=0.5, reactions=None, progress=True):
     with com:
         context = get_context(com)
         context(partial(reset_min_community_growth, com))
+        _use_warm_start(com)
+        base = _base_solution(com, fraction, growth_rate)
         by_medium = elasticities_by_medium(
-            com, reactions, fraction, growth_rate, progress
+            com, reactions, fraction, growth_rate, progress, threads, base
         )
         by_medium["type"] = "exchanges"
 
         by_abundance = elasticities_by_abundance(
-            com, reactions, fraction, growth_rate, progress
+            com, reactions, fraction, growth_rate, progress, threads, base
         )
         by_abundance["type"] = "abundance"
 
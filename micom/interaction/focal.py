@@ -2,33 +2,26 @@
 
 from ..taxonomy import taxon_id
 from ..workflows import GrowthResults, workflow
+import numpy as np
 import pandas as pd
 from typing import List, Union
 
 
-def _metabolite_interaction(
-    fluxes: pd.DataFrame, taxon: str, partner: str
-) -> pd.DataFrame:
-    """Checks if and how taxa interact."""
-    tol = fluxes.tolerance.max()
-    f = fluxes[(fluxes.flux.abs() * fluxes.abundance) > tol]
-    if (f.shape[0] < 2) or (f.direction == "export").all():
-        return None
-    if (f.direction == "import").sum() == 2:
+def _metabolite_interaction(pair: tuple, taxon: str) -> tuple:
+    """Classify how taxa interact on a metabolite they both exchange."""
+    if pair.direction_f == "import" and pair.direction_p == "import":
         int_type = "co-consumed"
-    elif (f.loc[f.taxon == taxon, "direction"] == "export").all():
+    elif pair.direction_f == "export":
         int_type = "provided"
     else:
         int_type = "received"
 
-    return pd.DataFrame(
-        {
-            "focal": taxon,
-            "partner": partner,
-            "class": int_type,
-            "flux": (f.flux.abs() * f.abundance).min(),
-        },
-        index=[0],
+    return (
+        pair.metabolite,
+        taxon,
+        pair.taxon,
+        int_type,
+        min(pair.scaled_f, pair.scaled_p),
     )
 
 
@@ -52,32 +45,43 @@ def sample_interactions(
         The mapped interactions between the focal taxon and all other taxa.
     """
     ex = fluxes[fluxes.sample_id == sample_id]
-    partners = pd.Series(ex.taxon.unique())
-    partners = partners[(partners != taxon) & (partners != "medium")]
-    ints = []
-    for p in partners:
-        fluxes = ex[ex.taxon.isin((taxon, p))]
-        ints.append(
-            fluxes.groupby("metabolite")
-            .apply(lambda df: _metabolite_interaction(df, taxon, p))
-            .reset_index()
+    ex = ex.assign(scaled=ex.flux.abs() * ex.abundance)
+    focal = ex.loc[
+        ex.taxon == taxon, ["metabolite", "scaled", "direction", "tolerance"]
+    ]
+    partners = ex[(ex.taxon != taxon) & (ex.taxon != "medium")]
+    pairs = partners.merge(focal, on="metabolite", suffixes=("_p", "_f"))
+    tol = np.maximum(pairs.tolerance_f.to_numpy(), pairs.tolerance_p.to_numpy())
+    interacting = (
+        (pairs.scaled_f.to_numpy() > tol)
+        & (pairs.scaled_p.to_numpy() > tol)
+        & (
+            (pairs.direction_f.to_numpy() != "export")
+            | (pairs.direction_p.to_numpy() != "export")
         )
-    ints = pd.concat([i for i in ints if i is not None])
+    )
+    ints = pd.DataFrame.from_records(
+        [
+            _metabolite_interaction(pair, taxon)
+            for pair in pairs[interacting].itertuples(index=False)
+        ],
+        columns=["metabolite", "focal", "partner", "class", "flux"],
+    )
     ints["sample_id"] = sample_id
     return ints
 
 
 def _interact(args: List) -> pd.DataFrame:
-    """Quantify interactions of a focal taxon with other taxa."""
-    results, taxon = args
-    ex = results.exchanges[results.exchanges.taxon != "medium"]
+    """Quantify interactions of a focal taxon with other taxa.
 
+    Expects the exchanges without the medium.
+    """
+    ex, taxon = args
     ints = (
         ex.groupby("sample_id")
         .apply(lambda df: sample_interactions(df, df.name, taxon))
         .reset_index(drop=True)
         .drop(["level_1", "index"], axis=1, errors="ignore")
-        .merge(results.annotations, on="metabolite")
     )
 
     return ints
@@ -104,15 +108,19 @@ def interactions(
     pandas.DataFrame
         The mapped interactions between the focal taxon and all other taxa.
     """
+    ex = results.exchanges[results.exchanges.taxon != "medium"]
     if isinstance(taxa, str):
-        return _interact([results, taxon_id(taxa, results.growth_rates)])
+        ints = _interact([ex, taxon_id(taxa, results.growth_rates)])
+        return ints.merge(results.annotations, on="metabolite")
     elif taxa is None:
         taxa = results.growth_rates.taxon.unique()
+    else:
+        ids = {t: taxon_id(t, results.growth_rates) for t in set(taxa)}
+        taxa = [ids[t] for t in taxa]
 
-    taxa = [taxon_id(t, results.growth_rates) for t in taxa]
     ints = pd.concat(
         workflow(
-            _interact, [[results, t] for t in taxa], threads=threads, progress=progress
+            _interact, [[ex, t] for t in taxa], threads=threads, progress=progress
         )
     )
-    return ints
+    return ints.merge(results.annotations, on="metabolite")
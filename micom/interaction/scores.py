@@ -1,15 +1,20 @@
 """Various interaction scores."""
 
-from collections import Counter
+import numpy as np
 import pandas as pd
 from micom.workflows import GrowthResults
 
 
-def _mes(df: pd.DataFrame) -> float:
-    """Helper to calculate the MES score."""
-    cn = Counter(df.direction)
-    p, c = cn["export"], cn["import"]
-    return pd.Series(2.0 * p * c / (p + c), index=["MES"])
+def _mes(fluxes: pd.DataFrame) -> pd.DataFrame:
+    """Helper to calculate the MES score for all metabolites and samples."""
+    counts = (
+        fluxes.groupby(["metabolite", "sample_id", "direction"])
+        .size()
+        .unstack("direction", fill_value=0)
+        .reindex(columns=["export", "import"], fill_value=0)
+    )
+    p, c = counts["export"], counts["import"]
+    return (2.0 * p * c / (p + c)).rename("MES").reset_index()
 
 
 def MES(results: GrowthResults, cutoff: float = None) -> pd.DataFrame:
@@ -39,12 +44,12 @@ def MES(results: GrowthResults, cutoff: float = None) -> pd.DataFrame:
            Disease-specific loss of microbial cross-feeding interactions in the human gut
            Nat Commun 14, 6546 (2023). https://doi.org/10.1038/s41467-023-42112-w
     """
+    ex = results.exchanges
     if cutoff is None:
-        cutoff = results.exchanges.tolerance[0]
-    fluxes = results.exchanges[
-        (results.exchanges.flux.abs() > cutoff) & (results.exchanges.taxon != "medium")
-    ]
-    mes = fluxes.groupby(["metabolite", "sample_id"]).apply(_mes).reset_index()
+        cutoff = ex.tolerance[0]
+    keep = (np.abs(ex.flux.to_numpy()) > cutoff) & (ex.taxon.to_numpy() != "medium")
+    fluxes = ex[keep]
+    mes = _mes(fluxes)
     mes = mes.merge(
         results.annotations.drop_duplicates(subset=["metabolite"]),
         on="metabolite",
@@ -5,17 +5,17 @@ import pandas as pd
 
 def _summarize(ints: pd.DataFrame) -> pd.DataFrame:
     """Summarize the overall interactions."""
-    return ints.groupby("class").apply(
-        lambda df: pd.DataFrame(
-            {
-                "flux": df.flux.sum(),
-                "mass_flux": (df.flux * df.molecular_weight).sum() * 1e-3,
-                "C_flux": (df.flux * df.C_number).sum(),
-                "N_flux": (df.flux * df.N_number).sum(),
-                "n_ints": df.metabolite.count(),
-            },
-            index=[0],
-        )
+    ints = ints.assign(
+        mass_flux=ints.flux * ints.molecular_weight * 1e-3,
+        C_flux=ints.flux * ints.C_number,
+        N_flux=ints.flux * ints.N_number,
+    )
+    return ints.groupby(["sample_id", "focal", "partner", "class"]).agg(
+        flux=("flux", "sum"),
+        mass_flux=("mass_flux", "sum"),
+        C_flux=("C_flux", "sum"),
+        N_flux=("N_flux", "sum"),
+        n_ints=("metabolite", "count"),
     )
 
 
@@ -34,9 +34,4 @@ def summarize_interactions(ints: pd.DataFrame) -> pd.DataFrame:
         nitrogen flux and number of interactions between any pair of taxa in that
         sample.
     """
-    return (
-        ints.groupby(["sample_id", "focal", "partner"])
-        .apply(_summarize)
-        .reset_index()
-        .drop("level_4", axis=1)
-    )
+    return _summarize(ints).reset_index()
@@ -1,11 +1,20 @@
 """configures the logger for micom."""
 
 import logging
+import sys
+from rich.console import Console
 from rich.logging import RichHandler
 
-formatter = logging.Formatter("%(message)s")
-handler = RichHandler(level=logging.WARNING, markup=True)
-handler.setFormatter(formatter)
-
 logger = logging.getLogger("micom")
-logger.addHandler(handler)
+
+if not logger.handlers:
+    if sys.stderr is not None and sys.stderr.isatty():
+        handler = RichHandler(
+            level=logging.WARNING, markup=True, console=Console(stderr=True)
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+    else:
+        handler = logging.StreamHandler()
+        handler.setLevel(logging.WARNING)
+        handler.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
+    logger.addHandler(handler)
@@ -1,7 +1,6 @@
 """Measures calculated based on fluxes."""
 
 import pandas as pd
-import numpy as np
 
 
 def production_rates(results):
@@ -32,8 +31,10 @@ def production_rates(results):
     fluxes = results.exchanges
     pos = fluxes[(fluxes.direction == "export") & (fluxes.taxon != "medium")]
     rates = (
-        pos.groupby(["sample_id", "metabolite"])
-        .apply(lambda df: pd.Series({"flux": np.sum(df.abundance * df.flux.abs())}))
+        (pos.abundance * pos.flux.abs())
+        .groupby([pos.sample_id, pos.metabolite])
+        .sum()
+        .rename("flux")
         .reset_index()
     )
     anns = results.annotations.reset_index(drop=True).drop_duplicates(
@@ -69,8 +70,10 @@ def consumption_rates(results):
     fluxes = results.exchanges
     neg = fluxes[(fluxes.direction == "import") & (fluxes.taxon != "medium")]
     rates = (
-        neg.groupby(["sample_id", "metabolite"])
-        .apply(lambda df: pd.Series({"flux": np.sum(df.abundance * df.flux.abs())}))
+        (neg.abundance * neg.flux.abs())
+        .groupby([neg.sample_id, neg.metabolite])
+        .sum()
+        .rename("flux")
         .reset_index()
     )
     rates = pd.merge(
@@ -1,6 +1,9 @@
 """Manages functions for growth media analysis and manipulation."""
 
+from collections import defaultdict
+from functools import lru_cache
 from cobra.core.formula import Formula, elements_and_molecular_weights
+from cobra.util.solver import interface_to_str
 from optlang.symbolics import Zero
 import numpy as np
 import pandas as pd
@@ -14,6 +17,38 @@ from micom.logger import logger
 from micom.solution import OptimizationError
 import warnings
 
+MIP_START_SOLVERS = ["gurobi", "cplex"]
+
+
+def _is_export(rxn):
+    """Check whether an exchange reaction is written in the export direction."""
+    mets = rxn._metabolites
+    products = [m for m, coef in mets.items() if coef > 0]
+    return len(mets) - len(products) == 1 or (
+        len(mets) == 2 and len(products) > 0 and products[0].compartment == "m"
+    )
+
+
+def _export_mask(exchanges):
+    """Get a boolean array denoting which exchanges are written as exports."""
+    return np.fromiter(
+        (_is_export(r) for r in exchanges), dtype=bool, count=len(exchanges)
+    )
+
+
+def _classify_exchanges(exchanges):
+    """Get the direction and import variable for a set of exchanges.
+
+    Returns a boolean array denoting export reactions and a list of the
+    variables that carry the import flux for each exchange.
+    """
+    export = _export_mask(exchanges)
+    variables = [
+        r.reverse_variable if ex else r.forward_variable
+        for r, ex in zip(exchanges, export)
+    ]
+    return export, variables
+
 
 def add_linear_obj(community, exchanges, weights):
     """Add a linear version of a minimal medium to the community.
@@ -37,22 +72,95 @@ def add_linear_obj(community, exchanges, weights):
     scale = 1.0
     if isinstance(community, Community):
         scale = community.scale
-    coefs = {}
-    for rxn in exchanges:
-        export = len(rxn.reactants) == 1 or (
-            len(rxn.metabolites) == 2 and rxn.products[0].compartment == "m"
-        )
-        met = list(rxn.metabolites)[0]
-        if export:
-            coefs[rxn.reverse_variable] = weights[met] * scale
-        else:
-            coefs[rxn.forward_variable] = weights[met] * scale
+    _, variables = _classify_exchanges(exchanges)
+    w = np.fromiter(
+        (weights[next(iter(r._metabolites))] for r in exchanges),
+        dtype=np.float64,
+        count=len(exchanges),
+    )
+    coefs = dict(zip(variables, (w * scale).tolist()))
     community.objective.set_linear_coefficients(coefs)
     community.objective.direction = "min"
     community.modification = "minimal medium linear"
 
 
-def add_mip_obj(community, exchanges):
+def _set_mip_start(community, values):
+    """Pass initial values for variables to the solver.
+
+    Only used for solvers in `MIP_START_SOLVERS`, does nothing for
+    other solvers.
+    """
+    interface = interface_to_str(community.solver.interface)
+    if interface == "gurobi":
+        for var, val in values.items():
+            var._internal_variable.Start = val
+    elif interface == "cplex":
+        starts = community.solver.problem.MIP_starts
+        starts.add(
+            [[v.name for v in values], list(values.values())],
+            starts.effort_level.auto,
+        )
+
+
+def _linear_fluxes(community, exchanges, weights):
+    """Get the exchange fluxes for the linear minimal medium.
+
+    Returns None if the optimization failed.
+    """
+    with community:
+        community.objective = Zero
+        add_linear_obj(community, exchanges, weights)
+        if community.slim_optimize(error_value=None) is None:
+            return None
+        return {r.id: r.flux for r in exchanges}
+
+
+def _linear_start(community, exchanges):
+    """Get a feasible flux for each exchange from the linear minimal medium.
+
+    Returns None if the solver does not support MIP starts.
+    """
+    if interface_to_str(community.solver.interface) not in MIP_START_SOLVERS:
+        return None
+    return _linear_fluxes(community, exchanges, weight(exchanges, None))
+
+
+def add_reweighted_obj(community, exchanges, weights, fluxes, eps=1e-3):
+    """Add a reweighted linear version of a minimal medium to the community.
+
+    Approximates the medium with the least components by penalizing imports
+    with the inverse of their flux in a previous solution, usually the linear
+    minimal medium::
+
+        minimize sum w_i/(v_i + eps)|r_i| for r_i in import_reactions
+
+    Imports that were not used before become expensive which pushes the
+    solution towards fewer components while staying a linear problem.
+
+    Arguments
+    ---------
+    community : micom.Community
+        The community to modify.
+    exchanges : list of cobra.Reaction
+        The reactions to constrain.
+    weights : dict
+        Maps each exchange reaction to a weight that is used in the
+        minimization.
+    fluxes : dict
+        Maps exchange reaction IDs to their fluxes in the previous solution.
+    eps : positive float
+        Added to the previous import fluxes to avoid dividing by zero.
+    """
+    reweighted = {}
+    for rxn, export in zip(exchanges, _export_mask(exchanges)):
+        flux = -fluxes.get(rxn.id, 0.0) if export else fluxes.get(rxn.id, 0.0)
+        met = next(iter(rxn._metabolites))
+        reweighted[met] = weights[met] / (max(flux, 0.0) + eps)
+    add_linear_obj(community, exchanges, reweighted)
+    community.modification = "minimal medium reweighted"
+
+
+def add_mip_obj(community, exchanges, warm=None):
     """Add a mixed-integer version of a minimal medium to the community.
 
     Changes the optimization objective to finding the medium with the least
@@ -66,6 +174,10 @@ def add_mip_obj(community, exchanges):
         The community to modify.
     exchanges : list of cobra.Reaction
         The reactions to constrain.
+    warm : dict
+        Maps exchange reaction IDs to the fluxes of a feasible solution, for
+        instance the linear minimal medium. Will be used as starting point for
+        the mixed-integer solver if supported.
     """
     check_modification(community)
     if len(community.variables) > 1e4:
@@ -74,40 +186,94 @@ def add_mip_obj(community, exchanges):
             " models that large :("
         )
     boundary_rxns = exchanges
-    M = max(np.max(np.abs(r.bounds)) for r in boundary_rxns)
+    M = max(max(abs(r.lower_bound), abs(r.upper_bound)) for r in boundary_rxns)
     prob = community.problem
     coefs = {}
+    start = {}
     to_add = []
-    for rxn in boundary_rxns:
-        export = len(rxn.reactants) == 1 or (
-            len(rxn.reactants) == 2 and rxn.products[0].compartment == "m"
-        )
+    ind_coefs = []
+    tol = community.solver.configuration.tolerances.feasibility
+    exports, variables = _classify_exchanges(boundary_rxns)
+    for rxn, export, var in zip(boundary_rxns, exports, variables):
+        # closed imports would always have an indicator of zero
+        bound = M if var.ub is None else var.ub
+        if bound <= 0:
+            continue
         indicator = prob.Variable("ind_" + rxn.id, lb=0, ub=1, type="binary")
-        if export:
-            vrv = rxn.reverse_variable
-            indicator_const = prob.Constraint(
-                vrv - indicator * M, ub=0, name="ind_constraint_" + rxn.id
-            )
-        else:
-            vfw = rxn.forward_variable
-            indicator_const = prob.Constraint(
-                vfw - indicator * M, ub=0, name="ind_constraint_" + rxn.id
-            )
+        if warm is not None:
+            flux = -warm.get(rxn.id, 0.0) if export else warm.get(rxn.id, 0.0)
+            start[indicator] = 1 if flux > tol else 0
+        indicator_const = prob.Constraint(Zero, ub=0, name="ind_constraint_" + rxn.id)
         to_add.extend([indicator, indicator_const])
+        ind_coefs.append((indicator_const, {var: 1.0, indicator: -bound}))
         coefs[indicator] = 1
     community.add_cons_vars(to_add)
     community.solver.update()
+    for const, const_coefs in ind_coefs:
+        const.set_linear_coefficients(const_coefs)
     community.objective.set_linear_coefficients(coefs)
     community.objective.direction = "min"
+    if start:
+        _set_mip_start(community, start)
     community.modification = "minimal medium mixed-integer"
 
 
+def _add_growth_constraint(model, lb):
+    """Require the current objective to stay above a minimum value.
+
+    Copies the coefficients of linear objectives directly instead of
+    rebuilding the symbolic expression.
+    """
+    objective = model.objective
+    if not objective.is_Linear:
+        const = model.problem.Constraint(
+            objective.expression, lb=lb, name="micom_growth_const"
+        )
+        model.add_cons_vars([const])
+        return const
+    const = model.problem.Constraint(Zero, name="micom_growth_const")
+    model.add_cons_vars([const])
+    model.solver.update()
+    const.set_linear_coefficients(
+        objective.get_linear_coefficients(objective.variables)
+    )
+    const.lb = lb
+    return const
+
+
+def _exchange_fluxes(model, exchanges):
+    """Get the fluxes for a set of exchanges from the last optimization.
+
+    Reads the primal values directly so the full flux table does not need to
+    be built.
+    """
+    primals = model.solver.primal_values
+    return np.array(
+        [primals[r.id] - primals[r.reverse_id] for r in exchanges], dtype=np.float64
+    )
+
+
+@lru_cache(maxsize=8192)
+def _formula_weight(formula):
+    """Get the weight for a formula string."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return Formula(formula).weight
+
+
+@lru_cache(maxsize=8192)
+def _formula_elements(formula):
+    """Get the elements for a formula string.
+
+    The returned dictionary is shared between calls and must not be modified.
+    """
+    return Formula(formula).elements
+
+
 def safe_weight(met):
     """Get the weight of a molecule."""
     try:
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")
-            w = max(Formula(met.formula).weight, 1.0)
+        w = max(_formula_weight(met.formula), 1.0)
     except Exception:
         w = 1.0
     return w
@@ -115,13 +281,13 @@ def safe_weight(met):
 
 def weight(exchanges, what):
     """Obtain elemental weights for metabolites."""
-    mets = [list(r.metabolites)[0] for r in exchanges]
     if what is None:
-        weights = {m: 1.0 for m in mets}
-    elif what == "mass":
+        return defaultdict(lambda: 1.0)
+    mets = [next(iter(r._metabolites)) for r in exchanges]
+    if what == "mass":
         weights = {m: safe_weight(m) for m in mets}
     elif what in elements_and_molecular_weights:
-        weights = {m: Formula(m.formula).elements.get(what, 1e-2) for m in mets}
+        weights = {m: _formula_elements(m.formula).get(what, 1e-2) for m in mets}
     else:
         raise ValueError(
             "%s is not a valid elements. Must be one of: %s."
@@ -164,10 +330,12 @@ def minimal_medium(
         False which will only return import fluxes.
     exchanges : list of cobra.Reactions
         The list of exchange reactions that are penalized.
-    minimize_components : boolean
+    minimize_components : boolean or "approximate"
         Whether to minimize the number of components instead of the total
         import flux. Might be more intuitive if set to True but may also be
-        slow to calculate for large communities.
+        slow to calculate for large communities. If set to "approximate" will
+        reduce the number of components by reweighting the linear minimal
+        medium which only requires solving two linear problems.
     open_exchanges : boolean or number
         Whether to ignore currently set bounds and make all exchange reactions
         in the model possible. If set to a number all exchange reactions will
@@ -219,38 +387,38 @@ def minimal_medium(
             for rxn in boundary_rxns:
                 rxn.bounds = (-open_bound, open_bound)
         logger.info("applying growth rate constraints")
-        const = community.problem.Constraint(
-            community.objective.expression,
-            lb=community_growth,
-            name="micom_growth_const",
-        )
-        community.add_cons_vars([const])
+        _add_growth_constraint(community, community_growth)
         _apply_min_growth(community, min_growth, atol, rtol)
         com.objective = Zero
         logger.info("adding new media objective")
-        if minimize_components:
-            add_mip_obj(com, boundary_rxns)
+        if minimize_components == "approximate":
+            scales = weight(boundary_rxns, weights)
+            fluxes = _linear_fluxes(com, boundary_rxns, scales)
+            if fluxes is None:
+                logger.warning("minimization of medium was unsuccessful")
+                return None
+            add_reweighted_obj(com, boundary_rxns, scales, fluxes)
+        elif minimize_components:
+            add_mip_obj(com, boundary_rxns, _linear_start(com, boundary_rxns))
         else:
             scales = weight(boundary_rxns, weights)
             add_linear_obj(com, boundary_rxns, scales)
-        sol = com.optimize(fluxes=True, pfba=False)
+        sol = com.optimize(fluxes=solution, pfba=False)
         if sol is None:
             logger.warning("minimization of medium was unsuccessful")
             return None
 
         logger.info("formatting medium")
-        medium = pd.Series(dtype="float64")
-        set_medium = community.medium
-        ex = [r for r in com.exchanges if r.id in set_medium]
-        for rxn in ex:
-            export = len(rxn.reactants) == 1
-            flux = sol.fluxes.loc["medium", rxn.id]
-            if abs(flux) < atol:
-                continue
-            if export:
-                medium[rxn.id] = -flux
-            elif not export:
-                medium[rxn.id] = flux
+        all_exchanges = boundary_rxns if exchanges is None else com.exchanges
+        set_medium = com.medium
+        ex = [r for r in all_exchanges if r.id in set_medium]
+        ids = np.array([r.id for r in ex], dtype=object)
+        export = _export_mask(ex)
+        flux = _exchange_fluxes(com, ex)
+        keep = np.abs(flux) >= atol
+        medium = pd.Series(
+            np.where(export, -flux, flux)[keep], index=ids[keep], dtype="float64"
+        )
         if not exports:
             medium = medium[medium > 0.0]
 
@@ -329,24 +497,25 @@ def complete_medium(
         model produces biomass with a rate >= `min_growth`.
 
     """
-    exids = [r.id for r in model.exchanges]
-    medium_rxns = [r for r in model.exchanges if r.id in medium.index]
-    candidates = [r for r in model.exchanges if r.id not in medium.index]
+    exchanges = model.exchanges
+    exids = set(r.id for r in exchanges)
+    in_medium = set(medium.index)
+    medium_rxns = [r for r in exchanges if r.id in in_medium]
+    candidates = [r for r in exchanges if r.id not in in_medium]
     medium = medium[[i for i in medium.index if i in exids]]
     tol = model.solver.configuration.tolerances.feasibility
     with model:
         model.modification = None
-        const = model.problem.Constraint(
-            model.objective.expression,
-            lb=growth,
-            name="micom_growth_const",
-        )
         if isinstance(model, Community):
             min_growth = _format_min_growth(min_growth, model.taxa)
             _apply_min_growth(model, min_growth, tol, tol)
-        model.add_cons_vars([const])
+        _add_growth_constraint(model, growth)
         model.objective = Zero
         model.medium = medium.to_dict()
+        if model.slim_optimize(error_value=None) is not None:
+            logger.info("medium already allows growth, nothing to complete")
+            completed = medium[[r.id for r in medium_rxns]]
+            return completed[completed > 0.0]
         extra_imports = []
         for ex in medium_rxns:
             if ex.id in strict:
@@ -359,8 +528,7 @@ def complete_medium(
             extra_imports.append(ex_copy)
             candidates.append(ex)
         model.add_reactions(extra_imports)
-        for ex in candidates:
-            export = len(ex.reactants) == 1
+        for ex, export in zip(candidates, _export_mask(candidates)):
             if export:
                 ex.lower_bound = -max_import
             else:
@@ -371,29 +539,30 @@ def complete_medium(
             scales = weight(candidates, weights)
             add_linear_obj(model, candidates, scales)
         if isinstance(model, Community):
-            sol = model.optimize(fluxes=True, pfba=False)
-            if sol is not None:
-                fluxes = sol.fluxes.loc["medium", :]
+            sol = model.optimize(pfba=False)
         else:
             try:
                 sol = model.optimize(raise_error=True)
-                fluxes = sol.fluxes
             except OptimizationError:
                 sol = None
+        if sol is not None:
+            ex_fluxes = _exchange_fluxes(model, exchanges)
     if sol is None:
         raise OptimizationError(
             "Could not find a solution that completes the medium :("
         )
-    completed = pd.Series(dtype="float64")
-    for rxn in model.exchanges:
-        export = len(rxn.reactants) == 1
-        flux = -fluxes[rxn.id] if export else fluxes[rxn.id]
+    strict = set(strict)
+    given = medium.to_dict()
+    completed = {}
+    for rxn, export, ex_flux in zip(exchanges, _export_mask(exchanges), ex_fluxes):
+        flux = -ex_flux if export else ex_flux
         if flux < tol:
             flux = 0.0
+        if rxn.id in given and rxn.id not in strict:
+            flux += given[rxn.id]
+        elif rxn.id in given:
+            flux = given[rxn.id]
         completed[rxn.id] = flux
-        if rxn.id in medium.index and rxn.id not in strict:
-            completed[rxn.id] += medium[rxn.id]
-        elif rxn.id in medium.index:
-            completed[rxn.id] = medium[rxn.id]
 
+    completed = pd.Series(completed, dtype="float64")
     return completed[completed > 0.0]
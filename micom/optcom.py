@@ -4,14 +4,46 @@ from micom.duality import fast_dual
 from micom.util import (
     _format_min_growth,
     _apply_min_growth,
+    _objective_coefficients,
+    _objective_constraints,
     check_modification,
 )
 from micom.logger import logger
 from micom.solution import solve
-from optlang.symbolics import Zero
+from optlang.symbolics import Zero, add
 from functools import partial
 
 
+DUAL_SUFFIXES = ["_constraint_lb", "_constraint_ub", "_constraint", "_lb", "_ub"]
+"""Suffixes `fast_dual` appends to the primal names of the dual variables."""
+
+
+def _dual_coefs_by_taxon(community, dual_coefs, prefix="dual_"):
+    """Group the dual coefficients by the taxon of their primal counterpart.
+
+    Dual variables are named after the primal constraint or variable they
+    were created from, which allows assigning them to a taxon via a single
+    lookup.
+    """
+    owner = {obj.name: sp for sp, obj in _objective_constraints(community).items()}
+    for r in community.reactions:
+        owner[r.id] = r.community_id
+        owner[r.reverse_id] = r.community_id
+    for m in community.metabolites:
+        owner[m.id] = m.community_id
+
+    by_taxon = {sp: {} for sp in community.taxa}
+    for dual_var, coef in dual_coefs.items():
+        name = dual_var.name[len(prefix) :]
+        for suffix in DUAL_SUFFIXES:
+            if name.endswith(suffix):
+                sp = owner.get(name[: -len(suffix)])
+                if sp in by_taxon:
+                    by_taxon[sp][dual_var] = -coef
+                break
+    return by_taxon
+
+
 def add_dualized_optcom(community, min_growth):
     """Add dual Optcom variables and constraints to a community.
 
@@ -43,36 +75,30 @@ def add_dualized_optcom(community, min_growth):
 
     prob = community.solver.interface
 
-    # Temporarily subtitute objective with sum of individual objectives
-    # for correct dual variables
-    old_obj = community.objective
-    community.objective = Zero
-    for sp in community.taxa:
-        taxa_obj = community.constraints["objective_" + sp]
-        community.objective += taxa_obj.expression
+    # Dualize the sum of individual objectives instead of the community
+    # objective for correct dual variables
+    taxa_coefs = [_objective_coefficients(community, sp) for sp in community.taxa]
+    coefs = {}
+    for growth in taxa_coefs:
+        for var, coef in growth.items():
+            coefs[var] = coefs.get(var, 0.0) + coef
 
     _apply_min_growth(community, min_growth)
-    dual_coefs = fast_dual(community)
+    dual_coefs = fast_dual(community, objective=coefs)
 
     logger.info("adding expressions for %d taxa" % len(community.taxa))
-    for sp in community.taxa:
-        primal_const = community.constraints["objective_" + sp]
-        coefs = primal_const.get_linear_coefficients(primal_const.variables)
-        coefs.update(
-            {
-                dual_var: -coef
-                for dual_var, coef in dual_coefs.items()
-                if sp in dual_var.name
-            }
-        )
-        obj_constraint = prob.Constraint(
-            Zero, lb=0, ub=0, name="optcom_suboptimality_" + sp
-        )
-        community.add_cons_vars([obj_constraint])
-        community.solver.update()
+    obj_constraints = [
+        prob.Constraint(Zero, lb=0, ub=0, name="optcom_suboptimality_" + sp)
+        for sp in community.taxa
+    ]
+    community.add_cons_vars(obj_constraints)
+    community.solver.update()
+    taxa_dual_coefs = _dual_coefs_by_taxon(community, dual_coefs)
+    for sp, obj_constraint, growth in zip(community.taxa, obj_constraints, taxa_coefs):
+        coefs = dict(growth)
+        coefs.update(taxa_dual_coefs[sp])
         obj_constraint.set_linear_coefficients(coefs)
 
-    community.objective = old_obj
     community.modification = "dual optcom"
     logger.info("finished adding dual optcom to %s" % community.id)
 
@@ -125,17 +151,27 @@ def add_moma_optcom(community, min_growth, linear=False):
     community.add_cons_vars([obj_constraint])
     community.solver.update()
     obj_constraint.set_linear_coefficients(coefs)
-    obj_expr = Zero
+    terms = []
     logger.info("adding expressions for %d taxa" % len(community.taxa))
-    for sp in community.taxa:
-        v = prob.Variable("gc_constant_" + sp, lb=max_gcs[sp], ub=max_gcs[sp])
-        community.add_cons_vars([v])
-        taxa_obj = community.constraints["objective_" + sp]
-        ex = v - taxa_obj.expression
-        if not linear:
-            ex = ex**2
-        obj_expr += ex.expand()
-    community.objective = prob.Objective(obj_expr, direction="min")
+    gc_constants = [
+        prob.Variable("gc_constant_" + sp, lb=max_gcs[sp], ub=max_gcs[sp])
+        for sp in community.taxa
+    ]
+    community.add_cons_vars(gc_constants)
+    for sp, v in zip(community.taxa, gc_constants):
+        growth = _objective_coefficients(community, sp)
+        # Expanded terms of (v - growth) or (v - growth)**2
+        if linear:
+            terms.append(v)
+            terms.extend(-c * x for x, c in growth.items())
+        else:
+            items = list(growth.items())
+            terms.append(v**2)
+            for i, (xi, ci) in enumerate(items):
+                terms.append(-2 * ci * v * xi)
+                terms.append(ci * ci * xi**2)
+                terms.extend(2 * ci * cj * xi * xj for xj, cj in items[i + 1 :])
+    community.objective = prob.Objective(add(terms), direction="min")
     community.modification = "moma optcom"
     logger.info("finished dual moma to %s" % community.id)
 
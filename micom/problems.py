@@ -4,9 +4,11 @@ from cobra.util import interface_to_str
 from micom.util import (
     _format_min_growth,
     _apply_min_growth,
+    _objective_coefficients,
     check_modification,
     get_context,
     reset_min_community_growth,
+    load_pickle,
 )
 from micom.logger import logger
 from micom.solution import (
@@ -15,15 +17,47 @@ from micom.solution import (
     optimize_with_retry,
     optimize_with_fraction,
 )
-from optlang.symbolics import Zero
+from optlang.symbolics import Zero, add
 from optlang.interface import OPTIMAL
+from collections import defaultdict
 from collections.abc import Sized
 from functools import partial
 import pandas as pd
 import numpy as np
+from os import path
+from tempfile import TemporaryDirectory
 from rich.progress import track
 
 
+def _l2_objective(community):
+    """Get the negative summed squared growth rates, reusing the last one.
+
+    Only growth rate variables that are not fixed enter the expression, so the
+    cache is keyed on those variables and the scale of the community.
+    """
+    groups = []
+    for sp in community.taxa:
+        growth = _objective_coefficients(community, sp)
+        groups.append([v for v in growth if (v.ub - v.lb) > 1e-6])
+    key = (community.scale, tuple(frozenset(v.name for v in g) for g in groups))
+    cached = getattr(community, "_l2_cache", None)
+    if cached is not None and cached[0] is community.solver and cached[1] == key:
+        logger.info("reusing the L2 objective for %s" % community.id)
+        return cached[2]
+
+    # Expanded terms of -scale * (x_1 + ... + x_n)**2
+    square = -community.scale
+    cross = 2.0 * square
+    terms = []
+    for variables in groups:
+        for i, xi in enumerate(variables):
+            terms.append(square * xi**2)
+            terms.extend(cross * xi * xj for xj in variables[i + 1 :])
+    l2 = add(terms) if terms else Zero
+    community._l2_cache = (community.solver, key, l2)
+    return l2
+
+
 def regularize_l2_norm(community, min_growth):
     """Add an objective to find the most "egoistic" solution.
 
@@ -50,18 +84,12 @@ def regularize_l2_norm(community, min_growth):
 
     """
     logger.info("adding L2 norm to %s" % community.id)
-    l2 = Zero
     community.variables.community_objective.lb = min_growth
     context = get_context(community)
     if context is not None:
         context(partial(reset_min_community_growth, community))
 
-    for sp in community.taxa:
-        taxa_obj = community.constraints["objective_" + sp]
-        ex = sum(v for v in taxa_obj.variables if (v.ub - v.lb) > 1e-6)
-        if not isinstance(ex, int):
-            l2 += (community.scale * (ex**2)).expand()
-    community.objective = -l2
+    community.objective = _l2_objective(community)
     community.modification = "l2 regularization"
     logger.info("finished adding tradeoff objective to %s" % community.id)
 
@@ -99,8 +127,16 @@ def cooperative_tradeoff(community, min_growth, fraction, fluxes, pfba, atol, rt
         return pd.DataFrame.from_records(results, columns=["tradeoff", "solution"])
 
 
-def knockout_taxa(community, taxa, fraction, method, progress, diag=True):
+def _knockout_growth(args):
+    """Get the growth rates for a batch of knockouts from a pickled community."""
+    filename, taxa, fraction = args
+    com = load_pickle(filename)
+    return list(_sequential_knockouts(com, taxa, fraction, False).items())
+
+
+def knockout_taxa(community, taxa, fraction, method, progress, diag=True, threads=1):
     """Knockout a taxon from the community."""
+    taxa = list(taxa)
     with community as com:
         check_modification(com)
         min_growth = _format_min_growth(0.0, com.taxa)
@@ -111,29 +147,83 @@ def knockout_taxa(community, taxa, fraction, method, progress, diag=True):
             optimize_with_retry(com, "could not get community growth rate.") / com.scale
         )
         regularize_l2_norm(com, fraction * community_min_growth)
-        old = com.optimize().members["growth_rate"]
-        results = []
+        old = com.optimize().members["growth_rate"].drop("medium")
+
+        if threads > 1 and len(taxa) > 1:
+            # importing micom.workflows at module level is circular since it
+            # imports micom.community which imports this module
+            from micom.workflows.core import workflow
+
+            with TemporaryDirectory(prefix="micom_") as tdir:
+                filename = path.join(tdir, "community.pickle")
+                com.to_pickle(filename)
+                # one batch per process so each one only loads the community once
+                batches = [taxa[i::threads] for i in range(threads)]
+                args = [(filename, b, fraction) for b in batches if len(b) > 0]
+                batched = workflow(
+                    _knockout_growth,
+                    args,
+                    threads,
+                    description="Knockouts",
+                    progress=progress,
+                )
+                growth = dict(g for batch in batched for g in batch)
+        else:
+            growth = _sequential_knockouts(com, taxa, fraction, progress)
 
-        iter = track(taxa, description="Knockouts") if progress else taxa
-        for sp in iter:
-            with com:
-                logger.info("getting growth rates for %s knockout." % sp)
-                [
-                    r.knock_out()
-                    for r in com.reactions.query(lambda ri: ri.community_id == sp)
-                ]
-
-                sol = optimize_with_fraction(com, fraction)
-                new = sol.members["growth_rate"]
-                if "change" in method:
-                    new = new - old
-                if "relative" in method:
-                    new /= old
-                results.append(new)
-
-        ko = pd.DataFrame(results, index=taxa).drop("medium", axis=1)
+        results = np.empty((len(taxa), len(old)))
+        for i, sp in enumerate(taxa):
+            results[i] = growth[sp].reindex(old.index).to_numpy()
+        if "change" in method:
+            results -= old.to_numpy()
+        if "relative" in method:
+            results /= old.to_numpy()
+
+        ko = pd.DataFrame(results, index=taxa, columns=old.index)
         ko = ko.loc[ko.index.sort_values(), ko.columns.sort_values()]
         if not diag:
             np.fill_diagonal(ko.values, np.NaN)
 
         return ko
+
+
+def _sequential_knockouts(com, taxa, fraction, progress):
+    """Get the growth rates for all knockouts in the current process."""
+    taxa_reactions = defaultdict(list)
+    for r in com.reactions:
+        taxa_reactions[r.community_id].append(r)
+
+    # Get all maximum community growth rates first so the objective only
+    # has to be switched once and the LPs can reuse the previous basis
+    max_growth = {}
+    iter = (
+        track(taxa, description="Max. growth", update_period=0.5) if progress else taxa
+    )
+    with com:
+        com.objective = com.scale * com.variables.community_objective
+        com.variables.community_objective.lb = 0
+        com.variables.community_objective.ub = None
+        for sp in iter:
+            with com:
+                logger.info("getting community growth for %s knockout." % sp)
+                for r in taxa_reactions[sp]:
+                    r.knock_out()
+                max_growth[sp] = (
+                    optimize_with_retry(
+                        com, message="could not get community growth rate."
+                    )
+                    / com.scale
+                )
+
+    growth = {}
+    iter = (
+        track(taxa, description="Knockouts", update_period=0.5) if progress else taxa
+    )
+    for sp in iter:
+        with com:
+            logger.info("getting growth rates for %s knockout." % sp)
+            for r in taxa_reactions[sp]:
+                r.knock_out()
+            sol = optimize_with_fraction(com, fraction, max_growth[sp])
+            growth[sp] = sol.members["growth_rate"]
+    return growth
@@ -5,6 +5,7 @@ import os
 from os import path
 import pandas as pd
 from zipfile import ZipFile
+from contextlib import contextmanager
 from ruamel.yaml import YAML
 from tempfile import TemporaryDirectory
 
@@ -16,15 +17,26 @@ _has_manifest = [
 ]
 
 
+def _read_metadata(zf, artifact):
+    """Read the metadata from an open Qiime 2 artifact."""
+    files = zf.namelist()
+    meta = [fi for fi in files if "metadata.yaml" in fi and "provenance" not in fi]
+    if len(meta) == 0:
+        raise ValueError("%s is not a valid Qiime 2 artifact :(" % artifact)
+    with zf.open(meta[0]) as mf:
+        return yaml.load(mf)
+
+
+@contextmanager
+def _open_artifact(artifact):
+    """Open a Qiime 2 artifact once and yield its metadata and archive."""
+    with ZipFile(artifact) as zf:
+        yield _read_metadata(zf, artifact), zf
+
+
 def metadata(artifact):
     """Read metadata from a Qiime 2 artifact."""
-    with ZipFile(artifact) as zf:
-        files = zf.namelist()
-        meta = [fi for fi in files if "metadata.yaml" in fi and "provenance" not in fi]
-        if len(meta) == 0:
-            raise ValueError("%s is not a valid Qiime 2 artifact :(" % artifact)
-        with zf.open(meta[0]) as mf:
-            meta = yaml.load(mf)
+    with _open_artifact(artifact) as (meta, _):
         return meta
 
 
@@ -32,11 +44,10 @@ def load_qiime_model_db(artifact, extract_path):
     """Prepare a model database for use."""
     if not path.exists(extract_path):
         os.mkdir(extract_path)
-    meta = metadata(artifact)
-    if meta["type"] != "MetabolicModels[JSON]":
-        raise ValueError("%s is not a q2-micom model database :(" % artifact)
-    uuid = meta["uuid"]
-    with ZipFile(artifact) as zf:
+    with _open_artifact(artifact) as (meta, zf):
+        if meta["type"] != "MetabolicModels[JSON]":
+            raise ValueError("%s is not a q2-micom model database :(" % artifact)
+        uuid = meta["uuid"]
         zf.extractall(extract_path)
     manifest = pd.read_csv(path.join(extract_path, uuid, "data", "manifest.csv"))
     manifest["file"] = [path.join(extract_path, uuid, "data", f) for f in manifest.file]
@@ -45,45 +56,40 @@ def load_qiime_model_db(artifact, extract_path):
 
 def load_qiime_manifest(artifact):
     """Prepare community models for use."""
-    meta = metadata(artifact)
-    if meta["type"] not in _has_manifest:
-        raise ValueError("%s is not a supported q2-micom artifact :(" % artifact)
-    uuid = meta["uuid"]
-    with ZipFile(artifact) as zf, TemporaryDirectory(prefix="micom_") as td:
-        zf.extract(uuid + "/data/manifest.csv", str(td))
-        manifest = pd.read_csv(path.join(str(td), uuid, "data", "manifest.csv"))
+    with _open_artifact(artifact) as (meta, zf):
+        if meta["type"] not in _has_manifest:
+            raise ValueError("%s is not a supported q2-micom artifact :(" % artifact)
+        with zf.open(meta["uuid"] + "/data/manifest.csv") as mf:
+            manifest = pd.read_csv(mf)
     return manifest
 
 
 def load_qiime_model(artifact, id):
     """Load a model from a Qiime 2 artifact."""
-    meta = metadata(artifact)
-    if meta["type"] != "CommunityModels[Pickle]":
-        raise ValueError(
-            "%s is not a q2-micom community model collection :(" % artifact
-        )
-    uuid = meta["uuid"]
-    with ZipFile(artifact) as zf, TemporaryDirectory(prefix="micom_") as td:
+    with _open_artifact(artifact) as (meta, zf):
+        if meta["type"] != "CommunityModels[Pickle]":
+            raise ValueError(
+                "%s is not a q2-micom community model collection :(" % artifact
+            )
         try:
-            zf.extract("%s/data/%s.pickle" % (uuid, id), str(td))
-        except Exception:
+            pf = zf.open("%s/data/%s.pickle" % (meta["uuid"], id))
+        except KeyError:
             raise ValueError(
                 "Could not extract model with ID `%s` :(. "
                 "Are you sure the ID is valid?" % id
             )
-        model = load_pickle(path.join(str(td), uuid, "data", "%s.pickle" % id))
+        with pf:
+            model = load_pickle(pf)
     return model
 
 
 def load_qiime_medium(artifact):
     """Load a growth medium/diet from a Qiime 2 artifact."""
-    meta = metadata(artifact)
-    if not meta["type"].startswith("MicomMedium["):
-        raise ValueError("%s is not a q2-micom medium :(" % artifact)
-    uuid = meta["uuid"]
-    with ZipFile(artifact) as zf, TemporaryDirectory(prefix="micom_") as td:
-        zf.extract(uuid + "/data/medium.csv", str(td))
-        medium = pd.read_csv(path.join(str(td), uuid, "data", "medium.csv"))
+    with _open_artifact(artifact) as (meta, zf):
+        if not meta["type"].startswith("MicomMedium["):
+            raise ValueError("%s is not a q2-micom medium :(" % artifact)
+        with zf.open(meta["uuid"] + "/data/medium.csv") as mf:
+            medium = pd.read_csv(mf)
     medium.index = medium.reaction
     return medium
 
@@ -98,25 +104,23 @@ def load_qiime_feature_table(artifact):
             "You can install it with:\n pip install numpy Cython\n"
             "pip install biom-format"
         )
-    meta = metadata(artifact)
-    if not meta["type"].startswith("FeatureTable["):
-        raise ValueError("%s is not a Qiime 2 FeatureTable :(" % artifact)
-    uuid = meta["uuid"]
-    with ZipFile(artifact) as zf, TemporaryDirectory(prefix="micom_") as td:
-        zf.extract(uuid + "/data/feature-table.biom", str(td))
-        table = biom.load_table(path.join(str(td), uuid, "data", "feature-table.biom"))
+    with _open_artifact(artifact) as (meta, zf):
+        if not meta["type"].startswith("FeatureTable["):
+            raise ValueError("%s is not a Qiime 2 FeatureTable :(" % artifact)
+        uuid = meta["uuid"]
+        with TemporaryDirectory(prefix="micom_") as td:
+            zf.extract(uuid + "/data/feature-table.biom", str(td))
+            table = biom.load_table(
+                path.join(str(td), uuid, "data", "feature-table.biom")
+            )
     return table
 
 
 def load_qiime_taxonomy(artifact):
     """Load taxonomy feature data from a Qiime 2 artifact."""
-    meta = metadata(artifact)
-    if not meta["type"].startswith("FeatureData[Taxonomy]"):
-        raise ValueError("%s is not a Qiime 2 FeatureData object :(" % artifact)
-    uuid = meta["uuid"]
-    with ZipFile(artifact) as zf, TemporaryDirectory(prefix="micom_") as td:
-        zf.extract(uuid + "/data/taxonomy.tsv", str(td))
-        taxa = pd.read_csv(
-            path.join(str(td), uuid, "data", "taxonomy.tsv"), sep="\t", index_col=0
-        )["Taxon"]
+    with _open_artifact(artifact) as (meta, zf):
+        if not meta["type"].startswith("FeatureData[Taxonomy]"):
+            raise ValueError("%s is not a Qiime 2 FeatureData object :(" % artifact)
+        with zf.open(meta["uuid"] + "/data/taxonomy.tsv") as tf:
+            taxa = pd.read_csv(tf, sep="\t", index_col=0)["Taxon"]
     return taxa
@@ -17,7 +17,11 @@ from cobra.exceptions import OptimizationError
 from cobra.core import Solution
 from cobra.util import interface_to_str, get_context
 from micom.logger import logger
-from micom.util import reset_min_community_growth, _apply_min_growth
+from micom.util import (
+    reset_min_community_growth,
+    _apply_min_growth,
+    _objective_constraints,
+)
 from swiglpk import glp_adv_basis
 
 
@@ -27,14 +31,68 @@ good = [OPTIMAL, NUMERIC, FEASIBLE, SUBOPTIMAL, ITERATION_LIMIT]
 DIRECTION = pd.Series(["import", "export"], index=[0, 1])
 
 
-def _group_taxa(values, ids, taxa, what="reaction"):
-    """Format a list of values by id and taxa."""
-    df = pd.DataFrame({values.name: values, what: ids, "compartment": taxa})
-    df = df.pivot(index="compartment", columns=what, values=values.name)
+def _taxa_index(ids, taxa):
+    """Map ids and taxa to the positions of a taxa x ids table."""
+    uniq_taxa, taxa_idx = np.unique(taxa, return_inverse=True)
+    uniq_ids, ids_idx = np.unique(ids, return_inverse=True)
+    return uniq_taxa, taxa_idx, uniq_ids, ids_idx
+
+
+def _group_taxa(values, index, what="reaction"):
+    """Format a list of values by id and taxa.
+
+    Each (id, taxon) pair is unique, so the values can be scattered into a
+    dense taxa x ids matrix directly.
+    """
+    uniq_taxa, taxa_idx, uniq_ids, ids_idx = index
+    mat = np.full((len(uniq_taxa), len(uniq_ids)), np.nan)
+    mat[taxa_idx, ids_idx] = np.asarray(values, dtype=np.float64)
+    df = pd.DataFrame(
+        mat,
+        index=pd.Index(uniq_taxa, name="compartment"),
+        columns=pd.Index(uniq_ids, name=what),
+    )
     df.name = values.name
     return df
 
 
+def _layout(reactions, metabolites):
+    """Get the taxa index of the reactions and the element counts per taxon."""
+    rids = np.array([(r.global_id, r.community_id) for r in reactions])
+    mids = np.array([(m.global_id, m.community_id) for m in metabolites])
+    return (
+        _taxa_index(rids[:, 0], rids[:, 1]),
+        pd.Series(Counter(rids[:, 1])),
+        pd.Series(Counter(mids[:, 1])),
+    )
+
+
+def _community_layout(community):
+    """Get the layout of the community, reusing it while the ids are unchanged."""
+    key = (
+        hash(tuple(r.id for r in community.reactions)),
+        hash(tuple(m.id for m in community.metabolites)),
+    )
+    cached = community.__dict__.get("_layout_cache")
+    if cached is None or cached[0] != key:
+        layout = _layout(community.reactions, community.metabolites)
+        cached = community._layout_cache = (key, layout)
+    return cached[1]
+
+
+BATCH_PRIMAL_SOLVERS = ["cplex", "gurobi"]
+"""Solvers where fetching all constraint values at once beats single lookups."""
+
+
+def _growth_rates(community):
+    """Get the current growth rate of each taxon."""
+    taxa_objs = _objective_constraints(community)
+    if interface_to_str(community.problem) in BATCH_PRIMAL_SOLVERS:
+        values = community.solver.constraint_values
+        return {sp: values[obj.name] for sp, obj in taxa_objs.items()}
+    return {sp: obj.primal for sp, obj in taxa_objs.items()}
+
+
 class CommunitySolution(Solution):
     """An FBA solution for an entire community.
 
@@ -72,22 +130,31 @@ class CommunitySolution(Solution):
 
     def __init__(self, community, slim=False, reactions=None, metabolites=None):
         """Get the solution from a community model."""
-        if reactions is None:
+        if reactions is None and metabolites is None:
             reactions = community.reactions
-        if metabolites is None:
-            metabolites = community.metabolites
-        rids = np.array([(r.global_id, r.community_id) for r in reactions])
-        mids = np.array([(m.global_id, m.community_id) for m in metabolites])
+            index, n_reactions, n_metabolites = _community_layout(community)
+        else:
+            if reactions is None:
+                reactions = community.reactions
+            if metabolites is None:
+                metabolites = community.metabolites
+            index, n_reactions, n_metabolites = _layout(reactions, metabolites)
         if not slim:
             var_primals = community.solver.primal_values
-            fluxes = pd.Series(
-                [var_primals[r.id] - var_primals[r.reverse_id] for r in reactions],
-                name="fluxes",
+            n = len(reactions)
+            fwd = np.fromiter(
+                (var_primals[r.id] for r in reactions), dtype=np.float64, count=n
+            )
+            rev = np.fromiter(
+                (var_primals[r.reverse_id] for r in reactions),
+                dtype=np.float64,
+                count=n,
             )
+            fluxes = pd.Series(fwd - rev, name="fluxes")
             super(CommunitySolution, self).__init__(
                 community.solver.objective.value,
                 community.solver.status,
-                _group_taxa(fluxes, rids[:, 0], rids[:, 1]),
+                _group_taxa(fluxes, index),
                 None,
                 None,
             )
@@ -99,9 +166,7 @@ class CommunitySolution(Solution):
                 None,
                 None,
             )
-        gcs = pd.Series(dtype="float64")
-        for sp in community.taxa:
-            gcs[sp] = community.constraints["objective_" + sp].primal
+        gcs = pd.Series(_growth_rates(community), index=community.taxa, dtype="float64")
         # Workaround for an optlang bug (PR #120)
         if interface_to_str(community.problem) == "gurobi":
             gcs = gcs.abs()
@@ -110,12 +175,12 @@ class CommunitySolution(Solution):
             {
                 "abundance": community.abundances,
                 "growth_rate": gcs,
-                "reactions": pd.Series(Counter(rids[:, 1])),
-                "metabolites": pd.Series(Counter(mids[:, 1])),
+                "reactions": n_reactions,
+                "metabolites": n_metabolites,
             }
         )
         self.members.index.name = "compartments"
-        self.growth_rate = sum(community.abundances * gcs)
+        self.growth_rate = float(community.abundances.dot(gcs))
 
     def _repr_html_(self):
         if self.status in good:
@@ -162,9 +227,7 @@ def add_pfba_objective(community, atol=1e-6, rtol=1e-6):
         The community to add the objective to.
     """
     # Fix all growth rates
-    rates = {
-        sp: community.constraints["objective_" + sp].primal for sp in community.taxa
-    }
+    rates = _growth_rates(community)
     _apply_min_growth(community, rates, atol, rtol)
 
     if community.solver.objective.name == "_pfba_objective":
@@ -248,8 +311,8 @@ def crossover(community, sol, fluxes=False):
         com.variables.community_objective.lb = 0.0
         com.variables.community_objective.ub = com_growth + 1e-6
         com.objective = com.scale * com.variables.community_objective
-        for sp in com.taxa:
-            const = com.constraints["objective_" + sp]
+        taxa_objs = _objective_constraints(com)
+        for sp, const in taxa_objs.items():
             const.ub = max(const.lb, gcs[sp])
         logger.info("finding closest feasible solution")
         s = com.optimize()
@@ -258,8 +321,8 @@ def crossover(community, sol, fluxes=False):
             s = com.optimize()
         if s is not None:
             s = CommunitySolution(com, slim=not fluxes)
-        for sp in com.taxa:
-            com.constraints["objective_" + sp].ub = None
+        for const in taxa_objs.values():
+            const.ub = None
     if s is None:
         raise OptimizationError(
             "crossover could not converge (status = %s)." % community.solver.status
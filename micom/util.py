@@ -11,6 +11,7 @@ from urllib.parse import urlparse
 import urllib.request as urlreq
 import tempfile
 from shutil import rmtree
+import numpy as np
 import pandas as pd
 import re
 from micom.logger import logger
@@ -90,8 +91,8 @@ def load_pickle(filename):
 
     Parameters
     ----------
-    filename : str
-        The file the community is stored in.
+    filename : str or file-like object
+        The file the community is stored in or an open binary file.
 
     Returns
     -------
@@ -99,10 +100,13 @@ def load_pickle(filename):
         The loaded community model.
 
     """
-    with open(filename, mode="rb") as infile:
-        mod = pickle.load(infile)
-        adjust_solver_config(mod.solver)
-        return mod
+    if hasattr(filename, "read"):
+        mod = pickle.load(filename)
+    else:
+        with open(filename, mode="rb") as infile:
+            mod = pickle.load(infile)
+    adjust_solver_config(mod.solver)
+    return mod
 
 
 def serialize_models(files, dir="."):
@@ -199,12 +203,13 @@ def join_models(model_files, id=None):
 def fluxes_from_primals(model, info):
     """Extract a list of fluxes from the model primals."""
     primals = model.solver.primal_values
-    rxns = model.reactions.query(lambda r: info.id == r.community_id)
+    rxns = [r for r in model.reactions if r.community_id == info.id]
     rids = [r.global_id for r in rxns]
 
-    fluxes = (
-        primals[rxn.forward_variable.name] - primals[rxn.reverse_variable.name]
-        for rxn in rxns
+    fluxes = np.fromiter(
+        (primals[rxn.id] - primals[rxn.reverse_id] for rxn in rxns),
+        dtype=np.float64,
+        count=len(rxns),
     )
     fluxes = pd.Series(fluxes, rids, name=info.id)
 
@@ -248,8 +253,53 @@ def check_modification(community):
         )
 
 
+class _ConstGrowth:
+    """A constant minimum growth rate shared by all taxa."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __getitem__(self, taxon):
+        return self.value
+
+    def __len__(self):
+        return 1
+
+
+def _objective_constraints(community):
+    """Get the growth rate constraint of each taxon.
+
+    The mapping is cached on the community for its current solver. It is
+    shared and must not be modified.
+    """
+    cached = community.__dict__.get("_objective_const_cache")
+    if cached is None or cached[0] is not community.solver:
+        constraints = community.constraints
+        taxa_objs = {sp: constraints["objective_" + sp] for sp in community.taxa}
+        cached = community._objective_const_cache = (community.solver, taxa_objs)
+    return cached[1]
+
+
+def _objective_coefficients(community, taxon):
+    """Get the growth rate coefficients for a taxon.
+
+    The coefficients of the taxa objectives never change after the community
+    is built, so they are cached on the community. The returned dictionary is
+    shared and must not be modified.
+    """
+    constraint = _objective_constraints(community)[taxon]
+    cache = community.__dict__.setdefault("_objective_coef_cache", {})
+    cached = cache.get(taxon)
+    if cached is None or cached[0] is not constraint:
+        coefs = constraint.get_linear_coefficients(constraint.variables)
+        cached = cache[taxon] = (constraint, coefs)
+    return cached[1]
+
+
 def _format_min_growth(min_growth, taxa):
-    """Format min_growth into a pandas series.
+    """Format min_growth into a per-taxon mapping.
 
     Arguments
     ---------
@@ -261,19 +311,23 @@ def _format_min_growth(min_growth, taxa):
 
     Returns
     -------
-    pandas.Series
-        A pandas Series mapping each individual to its minimum growth rate.
+    dict or _ConstGrowth
+        An object mapping each individual to its minimum growth rate. Single
+        values are wrapped without building a mapping.
 
     """
     try:
-        min_growth = float(min_growth)
+        return _ConstGrowth(float(min_growth))
     except (TypeError, ValueError):
         if len(min_growth) != len(taxa):
             raise ValueError(
                 "min_growth must be single value or an array-like "
                 "object with an entry for each taxon in the model."
             )
-    return pd.Series(min_growth, taxa)
+    if isinstance(min_growth, (pd.Series, dict)):
+        # align named values with the taxa
+        return pd.Series(min_growth, taxa).to_dict()
+    return dict(zip(taxa, np.asarray(min_growth, dtype=np.float64).tolist()))
 
 
 def _apply_min_growth(community, min_growth, atol=1e-6, rtol=1e-6):
@@ -283,22 +337,24 @@ def _apply_min_growth(community, min_growth, atol=1e-6, rtol=1e-6):
     """
     context = get_context(community)
 
-    def reset(taxon, lb):
-        logger.info("resetting growth rate constraint for %s" % taxon)
-        community.constraints["objective_" + taxon].ub = None
-        community.constraints["objective_" + taxon].lb = lb
+    def reset(obj, lb):
+        logger.info("resetting growth rate constraint for %s" % obj.name)
+        obj.ub = None
+        obj.lb = lb
 
-    for sp in community.taxa:
-        logger.info("setting growth rate constraint for %s" % sp)
-        obj = community.constraints["objective_" + sp]
-        if context:
-            context(partial(reset, sp, obj.lb))
-        obj.lb = (1.0 - rtol) * min_growth[sp] - atol
-        if obj.lb < atol:
+    for sp, obj in _objective_constraints(community).items():
+        lb = (1.0 - rtol) * min_growth[sp] - atol
+        if lb < atol:
             logger.info(
                 "minimal growth rate smaller than tolerance," " setting to zero."
             )
-            obj.lb = 0
+            lb = 0
+        if obj.lb == lb:
+            continue
+        logger.info("setting growth rate constraint for %s" % sp)
+        if context:
+            context(partial(reset, obj, obj.lb))
+        obj.lb = lb
 
 
 def adjust_solver_config(solver):
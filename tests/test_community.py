@@ -4,6 +4,7 @@ from .fixtures import community
 from micom import Community, load_pickle
 from micom.data import test_taxonomy
 import numpy as np
+from os import path
 
 
 def test_construction():
@@ -32,6 +33,29 @@ def test_abundances(community):
     assert np.allclose(community.abundances, expected)
 
 
+def test_abundance_context(community):
+    r = community.reactions.EX_glc__D_e__Escherichia_coli_1
+    glc_m = community.metabolites.get_by_id("glc__D_m")
+    ab = np.array([1.0, 2.0, 1.0, 1.0])
+    with community:
+        community.set_abundance(ab, normalize=False)
+        assert r.metabolites[glc_m] == 1.0
+        assert community.abundances.iloc[1] == 2.0
+    assert np.allclose(community.abundances, np.ones(4) / 4)
+    assert r.metabolites[glc_m] == 0.25
+
+
+def test_abundance_context_pickled(community, tmpdir):
+    filename = str(tmpdir.join("com.pickle"))
+    community.to_pickle(filename)
+    loaded = load_pickle(filename)
+    rate = loaded.optimize().growth_rate
+    with loaded:
+        loaded.set_abundance(np.array([1.0, 2.0, 1.0, 1.0]), normalize=False)
+        assert loaded.optimize().growth_rate < rate
+    assert np.allclose(loaded.optimize().growth_rate, rate)
+
+
 def test_exchanges(community):
     assert "glc__D_m" in community.metabolites
     assert "EX_glc__D_m" in community.reactions
@@ -53,3 +77,53 @@ def test_community_pickling(community, tmpdir):
     community.to_pickle(filename)
     loaded = load_pickle(filename)
     assert len(community.reactions) == len(loaded.reactions)
+
+
+def test_community_pickle_cache(community, tmpdir):
+    filename = str(tmpdir.join("com.pickle"))
+    community.to_pickle(filename)
+    mtime = path.getmtime(filename)
+    community.to_pickle(filename)
+    assert path.getmtime(filename) == mtime
+    community.reactions.EX_glc__D_m.lower_bound = -5
+    community.to_pickle(filename)
+    loaded = load_pickle(filename)
+    assert loaded.reactions.EX_glc__D_m.lower_bound == -5
+    assert getattr(loaded, "_pickle_cache", None) is None
+
+
+def test_community_pickle_cache_coefficients(community, tmpdir):
+    filename = str(tmpdir.join("com.pickle"))
+    community.to_pickle(filename)
+    rxn = community.reactions[0]
+    met = next(iter(rxn.metabolites))
+    old = rxn.get_coefficient(met.id)
+    rxn.add_metabolites({met: 1.0})
+    community.to_pickle(filename)
+    loaded = load_pickle(filename)
+    assert loaded.reactions.get_by_id(rxn.id).get_coefficient(met.id) == old + 1.0
+
+
+def test_community_pickle_cache_variables(community, tmpdir):
+    filename = str(tmpdir.join("com.pickle"))
+    community.to_pickle(filename)
+    community.variables.community_objective.lb = 0.1
+    community.to_pickle(filename)
+    loaded = load_pickle(filename)
+    assert loaded.variables.community_objective.lb == 0.1
+
+
+def test_community_version_context(community):
+    version = community._version
+    with community:
+        community.objective = community.variables.community_objective
+        assert community._version != version
+    assert community._version == version
+
+
+def test_optimize_all_cache_coefficients(community):
+    rates = community.optimize_all()
+    bm = [r for r in community.reactions if "BIOMASS" in r.id.upper()][0]
+    bm.add_metabolites({m: c for m, c in bm.metabolites.items()})
+    new = community.optimize_all()
+    assert not np.allclose(rates, new)
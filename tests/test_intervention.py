@@ -1,8 +1,8 @@
 """Test interventions."""
 
 from .fixtures import community
-from micom.elasticity import elasticities
-from pytest import approx
+from micom.elasticity import elasticities, elasticities_by_medium, _get_fluxes
+from pytest import approx, raises
 
 
 def test_elasticities(community):
@@ -12,3 +12,26 @@ def test_elasticities(community):
     s = el[(el.reaction == "EX_glc__D_m") & (el.effector == "EX_glc__D_m")]
     print(s)
     assert s.elasticity.iloc[0] == approx(1.0)
+
+
+def test_elasticities_parallel(community):
+    el = elasticities(
+        community, fraction=1.0, reactions=["EX_glc__D_m"], progress=False, threads=2
+    )
+    s = el[(el.reaction == "EX_glc__D_m") & (el.effector == "EX_glc__D_m")]
+    assert s.elasticity.iloc[0] == approx(1.0, rel=1e-3)
+
+
+def test_elasticities_by_medium_resets(community):
+    growth = community.variables.community_objective
+    bounds = (growth.lb, growth.ub)
+    reactions = [community.reactions.EX_glc__D_m]
+    el = elasticities_by_medium(community, reactions, 1.0, None, False)
+    assert "effector" in el.columns
+    assert (growth.lb, growth.ub) == bounds
+
+
+def test_get_fluxes_missing(community):
+    sol = community.optimize(fluxes=True)
+    with raises(KeyError):
+        _get_fluxes(sol, (["medium"], ["not_a_reaction"]))
@@ -20,3 +20,10 @@ def test_single_knockout(community):
     ko = community.knockout_taxa(taxa=community.taxa[0])
     assert ko.shape == (1, 4)
     assert ko.iloc[0, :].values == approx([-0.874, 0.305, 0.305, 0.305], 0.01)
+
+
+def test_parallel_knockout(community):
+    ko = community.knockout_taxa(progress=False)
+    par = community.knockout_taxa(progress=False, threads=2)
+    assert par.shape == ko.shape
+    assert par.values == approx(ko.values, rel=1e-3, abs=1e-6)
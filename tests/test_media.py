@@ -38,6 +38,14 @@ def test_medium_mip(community):
     assert all(medium > 1e-9)
 
 
+def test_medium_approximate(community):
+    medium = media.minimal_medium(
+        community, 0.8, 0.8, minimize_components="approximate"
+    )
+    assert len(medium) <= 4
+    assert all(medium > 1e-9)
+
+
 def test_medium_mass(community):
     medium = media.minimal_medium(community, 0.8, 0.8, weights="mass")
     assert len(medium) <= 4
@@ -6,6 +6,7 @@ from cobra.util.solver import solvers
 import numpy as np
 import pytest
 from micom.solution import CommunitySolution
+from micom.duality import _objective_component, _dual_key
 
 stable = ["glpk", "cplex"]
 solvers = [s for s in solvers.keys() if s in stable]
@@ -24,3 +25,40 @@ def test_community_objective(community):
 def test_individual_objective(community):
     growth_rates = community.optimize_all()
     assert np.allclose(growth_rates, 4 * 0.873922)
+
+
+def test_individual_objective_direction(community):
+    community.objective_direction = "min"
+    growth_rates = community.optimize_all()
+    assert np.allclose(growth_rates, 4 * 0.873922)
+
+
+def test_individual_objective_cache(community):
+    growth_rates = community.optimize_all()
+    community.variables.community_objective.ub = 0.01
+    limited = community.optimize_all()
+    assert not np.allclose(growth_rates, limited)
+    assert all(limited < growth_rates)
+
+
+def test_objective_component(community):
+    v = community.problem.Variable("dangling", lb=0, ub=1)
+    c = community.problem.Constraint(v, ub=1, name="dangling_constraint")
+    community.add_cons_vars([v, c])
+    variables, constraints = _objective_component(community)
+    assert "community_objective" in variables
+    assert "community_objective_equality" in constraints
+    assert "dangling" not in variables
+    assert "dangling_constraint" not in constraints
+
+
+def test_dual_key_coefficients(community):
+    objective = community.objective.get_linear_coefficients(
+        community.objective.variables
+    )
+    key = _dual_key(community, objective, "dual_")
+    assert key == _dual_key(community, objective, "dual_")
+    rxn = community.reactions[0]
+    met = next(iter(rxn.metabolites))
+    rxn.add_metabolites({met: 1.0})
+    assert key != _dual_key(community, objective, "dual_")
@@ -41,6 +41,17 @@ def test_fluxes_from_primals(community):
     assert len(fluxes) == 95
 
 
+def test_objective_constraints(community):
+    taxa_objs = util._objective_constraints(community)
+    assert list(taxa_objs) == list(community.taxa)
+    for sp, obj in taxa_objs.items():
+        assert obj is community.constraints["objective_" + sp]
+    assert util._objective_constraints(community) is taxa_objs
+    coefs = util._objective_coefficients(community, community.taxa[0])
+    assert len(coefs) > 0
+    assert util._objective_coefficients(community, community.taxa[0]) is coefs
+
+
 def test_join_models():
     single = util.load_model(tax.file[0])
     single_coefs = {